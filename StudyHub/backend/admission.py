@@ -0,0 +1,223 @@
+"""Admission control: shed excess load before it queues on the DB pool.
+
+`AdmissionMiddleware` runs before routing and answers in microseconds:
+
+- Per-user token bucket over all routes (ADMISSION_USER_RATE/BURST), and
+  a tighter per-user bucket per write route (ADMISSION_ROUTE_RATE/BURST),
+  so one client spamming pause or task updates is throttled alone. Over
+  the limit: 429 with Retry-After set to when the next token is due.
+- Global in-flight limiter: above ADMISSION_MIN_INFLIGHT requests, new
+  ones are refused with 503 + Retry-After while the smoothed DB pool
+  checkout wait is over ADMISSION_POOL_WAIT_MS, and always above
+  ADMISSION_MAX_INFLIGHT. Shedding then beats letting requests sit in
+  the pool queue until DB_POOL_TIMEOUT.
+
+The caller is the user of a valid Bearer token, else the client address.
+The `user_id` query parameter is never trusted: anyone could rotate it to
+get a fresh bucket. Behind a reverse proxy the socket address is the
+proxy's, so set ADMISSION_CLIENT_HEADER to the header the proxy writes
+the client address into (e.g. x-forwarded-for; its last entry, the one
+the proxy appended, is used). Without it every tokenless caller would
+share one bucket, and the shipped frontend sends no tokens yet, so
+admission is off unless ADMISSION_ENABLED=1: turn it on together with
+ADMISSION_CLIENT_HEADER, or when the app is served directly.
+
+Health and metrics endpoints and CORS preflights are never limited, and
+event streams do not count as in flight. State is per process, like the
+other in-memory structures.
+"""
+import json
+import math
+import os
+import time
+from collections import OrderedDict
+
+from starlette.routing import Match
+
+from .database import async_pool_stats, pool_stats, DB_MAX_OVERFLOW, DB_POOL_SIZE
+from .tokens import InvalidToken, verifier
+
+# ============================================================
+# Settings
+# ============================================================
+ADMISSION_ENABLED = os.getenv("ADMISSION_ENABLED", "0") == "1"
+ADMISSION_CLIENT_HEADER = os.getenv("ADMISSION_CLIENT_HEADER", "").strip().lower().encode("latin-1")  # set by the trusted proxy
+ADMISSION_USER_RATE = float(os.getenv("ADMISSION_USER_RATE", "20"))       # requests/sec per user, all routes
+ADMISSION_USER_BURST = float(os.getenv("ADMISSION_USER_BURST", "40"))
+ADMISSION_ROUTE_RATE = float(os.getenv("ADMISSION_ROUTE_RATE", "5"))      # requests/sec per user and write route
+ADMISSION_ROUTE_BURST = float(os.getenv("ADMISSION_ROUTE_BURST", "10"))
+ADMISSION_MIN_INFLIGHT = int(os.getenv("ADMISSION_MIN_INFLIGHT", str(DB_POOL_SIZE + DB_MAX_OVERFLOW)))
+ADMISSION_MAX_INFLIGHT = int(os.getenv("ADMISSION_MAX_INFLIGHT", "200"))
+ADMISSION_POOL_WAIT_MS = float(os.getenv("ADMISSION_POOL_WAIT_MS", "250"))
+ADMISSION_MAX_KEYS = int(os.getenv("ADMISSION_MAX_KEYS", "10000"))        # buckets kept (oldest dropped)
+
+EXEMPT_PATHS = ("/ready", "/metrics", "/api/metrics/")
+READ_METHODS = ("GET", "HEAD", "OPTIONS")
+
+
+class TokenBuckets:
+    """rate/burst buckets keyed by anything hashable; a dropped bucket
+    comes back full, which only ever errs towards admitting."""
+
+    def __init__(self, rate: float, burst: float, max_keys: int = ADMISSION_MAX_KEYS):
+        self.rate = rate
+        self.burst = burst
+        self.max_keys = max_keys
+        self._buckets: OrderedDict = OrderedDict()   # key -> [tokens, updated_at]
+
+    def take(self, key, now: float) -> float:
+        """0 if a token was taken, else seconds until one is available."""
+        bucket = self._buckets.get(key)
+        if bucket is None:
+            bucket = self._buckets[key] = [self.burst, now]
+            if len(self._buckets) > self.max_keys:
+                self._buckets.popitem(last=False)
+        else:
+            self._buckets.move_to_end(key)
+            bucket[0] = min(self.burst, bucket[0] + (now - bucket[1]) * self.rate)
+            bucket[1] = now
+        if bucket[0] >= 1:
+            bucket[0] -= 1
+            return 0.0
+        return (1 - bucket[0]) / self.rate
+
+    def __len__(self) -> int:
+        return len(self._buckets)
+
+
+class AdmissionStats:
+    def __init__(self):
+        self.admitted = 0
+        self.shed_user = 0          # 429, per-user bucket
+        self.shed_route = 0         # 429, per-user write-route bucket
+        self.shed_overload = 0      # 503, pool saturated / too many in flight
+        self.in_flight = 0
+        self.in_flight_max = 0
+
+
+stats = AdmissionStats()
+user_buckets = TokenBuckets(ADMISSION_USER_RATE, ADMISSION_USER_BURST)
+route_buckets = TokenBuckets(ADMISSION_ROUTE_RATE, ADMISSION_ROUTE_BURST)
+
+
+def pool_wait_ms() -> float:
+    return max(pool_stats.recent_wait(), async_pool_stats.recent_wait()) * 1000
+
+
+def snapshot() -> dict:
+    return {
+        "enabled": ADMISSION_ENABLED,
+        "client_header": ADMISSION_CLIENT_HEADER.decode("latin-1") or None,
+        "admitted": stats.admitted,
+        "shed_user": stats.shed_user,
+        "shed_route": stats.shed_route,
+        "shed_overload": stats.shed_overload,
+        "in_flight": stats.in_flight,
+        "in_flight_max": stats.in_flight_max,
+        "pool_wait_ewma_ms": round(pool_wait_ms(), 3),
+        "user_buckets": len(user_buckets),
+        "route_buckets": len(route_buckets),
+    }
+
+
+# ============================================================
+# Middleware
+# ============================================================
+class AdmissionMiddleware:
+    """Pure ASGI middleware. Add it inside CORSMiddleware so rejections
+    still carry CORS headers."""
+
+    def __init__(self, app, router):
+        self.app = app
+        self.router = router
+        self._templates: dict[tuple[str, str], str] = {}
+
+    def _route(self, scope) -> str:
+        """Route template for the request (e.g. /focus/sessions/{sid}/pause)."""
+        key = (scope["method"], scope["path"])
+        template = self._templates.get(key)
+        if template is None:
+            template = scope["path"]
+            for route in self.router.routes:
+                match, _ = route.matches(scope)
+                if match == Match.FULL:
+                    template = getattr(route, "path", template)
+                    break
+            if len(self._templates) >= ADMISSION_MAX_KEYS:
+                self._templates.clear()
+            self._templates[key] = template
+        return template
+
+    @staticmethod
+    def _caller(scope) -> str:
+        forwarded = None
+        for name, value in scope.get("headers", ()):
+            if name == b"authorization":
+                scheme, _, token = value.decode("latin-1").partition(" ")
+                if scheme.lower() == "bearer":
+                    try:
+                        return f"user:{verifier.verify(token.strip())}"
+                    except InvalidToken:
+                        pass     # the route itself answers 401
+            elif ADMISSION_CLIENT_HEADER and name == ADMISSION_CLIENT_HEADER:
+                forwarded = value
+        if forwarded is not None:
+            # earlier entries come from the client; the last one from our proxy
+            address = forwarded.decode("latin-1").rsplit(",", 1)[-1].strip()
+            if address:
+                return f"ip:{address}"
+        client = scope.get("client")
+        return f"ip:{client[0]}" if client else "ip:unknown"
+
+    async def __call__(self, scope, receive, send):
+        if (
+            not ADMISSION_ENABLED
+            or scope["type"] != "http"
+            or scope["method"] == "OPTIONS"
+            or scope["path"].startswith(EXEMPT_PATHS)
+        ):
+            return await self.app(scope, receive, send)
+
+        now = time.monotonic()
+        caller = self._caller(scope)
+        wait = user_buckets.take(caller, now)
+        if wait:
+            stats.shed_user += 1
+            return await _reject(send, 429, "Too many requests", wait)
+        route = self._route(scope)
+        if scope["method"] not in READ_METHODS:
+            wait = route_buckets.take((caller, scope["method"], route), now)
+            if wait:
+                stats.shed_route += 1
+                return await _reject(send, 429, "Too many requests for this action", wait)
+
+        streaming = route.endswith("/stream")
+        if not streaming and stats.in_flight >= ADMISSION_MIN_INFLIGHT and (
+            stats.in_flight >= ADMISSION_MAX_INFLIGHT or pool_wait_ms() > ADMISSION_POOL_WAIT_MS
+        ):
+            stats.shed_overload += 1
+            return await _reject(send, 503, "Server is busy, please retry", 1.0)
+
+        stats.admitted += 1
+        if streaming:
+            return await self.app(scope, receive, send)
+        stats.in_flight += 1
+        stats.in_flight_max = max(stats.in_flight_max, stats.in_flight)
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            stats.in_flight -= 1
+
+
+async def _reject(send, status: int, detail: str, retry_after: float):
+    body = json.dumps({"detail": detail}).encode()
+    await send({
+        "type": "http.response.start",
+        "status": status,
+        "headers": [
+            (b"content-type", b"application/json"),
+            (b"content-length", str(len(body)).encode()),
+            (b"retry-after", str(max(1, math.ceil(retry_after))).encode()),
+        ],
+    })
+    await send({"type": "http.response.body", "body": body})
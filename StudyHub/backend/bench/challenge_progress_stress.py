@@ -0,0 +1,103 @@
+"""Concurrency stress check for challenge joins and task-progress updates.
+
+Many users join one challenge at once (more than it has seats), then all
+members toggle their tasks concurrently. Afterwards the challenge's
+participant_count, progress_sum and group_progress must match what the
+participant rows say exactly. Exits non-zero on any lost update.
+
+    python -m backend.bench.challenge_progress_stress -u 40 -r 25
+    DATABASE_URL=postgresql://... python -m backend.bench.challenge_progress_stress
+"""
+import os
+import tempfile
+
+_DEFAULT_DB = os.path.join(tempfile.gettempdir(), "studyhub_stress.db")
+if "DATABASE_URL" not in os.environ:
+    for suffix in ("", "-wal", "-shm"):
+        if os.path.exists(_DEFAULT_DB + suffix):
+            os.remove(_DEFAULT_DB + suffix)
+    os.environ["DATABASE_URL"] = f"sqlite:///{_DEFAULT_DB}"
+os.environ.setdefault("ADMISSION_ENABLED", "0")    # the point is to collide, not to be throttled
+
+import argparse
+import random
+import sys
+from concurrent.futures import ThreadPoolExecutor
+
+from fastapi.testclient import TestClient
+from sqlalchemy import func, select
+
+from ..database import SessionLocal
+from ..main import app
+from ..models import Challenge, ChallengeParticipant
+
+TASKS = ["read", "practice", "review", "summarize"]
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("-u", "--users", type=int, default=40, help="users trying to join")
+    parser.add_argument("-s", "--seats", type=int, default=30, help="max_participants")
+    parser.add_argument("-r", "--rounds", type=int, default=20, help="task updates per member")
+    parser.add_argument("-w", "--workers", type=int, default=32)
+    args = parser.parse_args()
+
+    with TestClient(app) as client:
+        created = client.post("/api/challenges", json={
+            "title": "stress", "creator_name": "bench", "max_participants": args.seats, "tasks": TASKS,
+        }).json()
+        cid = created["id"]
+
+        def join(user_id: int) -> int:
+            return client.post(f"/api/challenges/{cid}/join", params={"user_id": user_id}).status_code
+
+        with ThreadPoolExecutor(args.workers) as pool:
+            statuses = list(pool.map(join, range(1, args.users + 1)))
+        joined = [uid for uid, code in zip(range(1, args.users + 1), statuses) if code == 200]
+
+        def toggle(user_id: int) -> float:
+            rng = random.Random(user_id)
+            last = 0.0
+            for _ in range(args.rounds):
+                done = [rng.random() < 0.5 for _ in TASKS]
+                payload = [{"title": t, "done": d} for t, d in zip(TASKS, done)]
+                response = client.patch(f"/api/challenges/{cid}/tasks", params={"user_id": user_id}, json=payload)
+                if response.status_code != 200:
+                    raise RuntimeError(f"user {user_id}: HTTP {response.status_code} {response.text}")
+                last = round(sum(done) / len(TASKS) * 100.0, 2)
+            return last
+
+        with ThreadPoolExecutor(args.workers) as pool:
+            expected = dict(zip(joined, pool.map(toggle, joined)))
+
+    with SessionLocal() as db:
+        challenge = db.get(Challenge, cid)
+        rows = dict(db.execute(
+            select(ChallengeParticipant.user_id, ChallengeParticipant.progress)
+            .where(ChallengeParticipant.challenge_id == cid)
+        ).all())
+        row_sum = db.scalar(
+            select(func.coalesce(func.sum(ChallengeParticipant.progress), 0.0))
+            .where(ChallengeParticipant.challenge_id == cid)
+        )
+
+    expected_avg = round(sum(expected.values()) / len(expected), 2) if expected else 0.0
+    checks = [
+        ("joins capped at seats", len(joined) == min(args.users, args.seats)),
+        ("participant_count == member rows", challenge.participant_count == len(rows)),
+        ("member rows == successful joins", set(rows) == set(joined)),
+        ("each member's final progress kept", rows == expected),
+        ("progress_sum == SUM(progress)", abs(challenge.progress_sum - row_sum) < 1e-6),
+        ("group_progress == exact average", abs(challenge.group_progress - expected_avg) < 1e-9),
+    ]
+    for label, ok in checks:
+        print(f"{'ok  ' if ok else 'FAIL'} {label}")
+    print(
+        f"\njoined={len(joined)}/{args.users} updates={len(joined) * args.rounds} "
+        f"group_progress={challenge.group_progress} expected={expected_avg}"
+    )
+    return 0 if all(ok for _, ok in checks) else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,124 @@
+"""Sync vs async throughput for focus-timer transitions.
+
+Runs the same pause/resume round trip N times at a fixed concurrency,
+once through sync Sessions on a thread pool (what a sync `def` route gets
+from FastAPI's 40-thread limiter) and once through the async handlers in
+backend.focusTime on a single event loop.
+
+    DATABASE_URL=postgresql://... python -m backend.bench.focus_async -c 100 -n 2000
+
+Without DATABASE_URL a throwaway SQLite file is used; SQLite has no
+network round trip, so the async advantage only really shows on Postgres.
+"""
+import os
+import tempfile
+
+os.environ.setdefault("DATABASE_URL", f"sqlite:///{tempfile.gettempdir()}/studyhub_bench.db")
+
+import argparse
+import asyncio
+import statistics
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+from ..database import AsyncWriteSessionLocal, SessionLocal, WriteSessionLocal, async_engine, engine
+from ..focusTime import pause_session, resume_session
+from ..migrations import upgrade
+from ..models import FocusSession, SessionStatus
+from ..schemas import FocusTick
+
+THREADPOOL_LIMIT = 40  # anyio's default for FastAPI sync routes
+
+
+def _seed(count: int) -> list[int]:
+    upgrade(engine)
+    with SessionLocal() as db:
+        rows = [
+            FocusSession(title=f"bench {i}", duration_min=25, user_id=i + 1,
+                         status=SessionStatus.running, started_at=datetime.utcnow())
+            for i in range(count)
+        ]
+        db.add_all(rows)
+        db.commit()
+        return [r.id for r in rows]
+
+
+def _percentiles(samples: list[float]) -> dict:
+    samples = sorted(samples)
+    q = statistics.quantiles(samples, n=100)
+    return {"p50_ms": q[49] * 1000, "p95_ms": q[94] * 1000}
+
+
+# ---------- sync path ----------
+def _sync_transition(sid: int, to_status: SessionStatus):
+    with WriteSessionLocal() as db:    # what a sync POST route gets
+        sess = db.get(FocusSession, sid)
+        if to_status == SessionStatus.paused:
+            sess.elapsed_sec = min(sess.elapsed_sec + 1, sess.duration_min * 60)
+            sess.pauses_count += 1
+            sess.did_pause = True
+        sess.status = to_status
+        db.commit(); db.refresh(sess)
+
+
+def run_sync(ids: list[int], total: int) -> tuple[float, list[float]]:
+    latencies: list[float] = []
+
+    def worker(sid: int, rounds: int):
+        for _ in range(rounds):
+            t0 = time.perf_counter()
+            _sync_transition(sid, SessionStatus.paused)
+            _sync_transition(sid, SessionStatus.running)
+            latencies.append(time.perf_counter() - t0)
+
+    rounds = max(total // len(ids), 1)
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=min(len(ids), THREADPOOL_LIMIT)) as pool:
+        list(pool.map(worker, ids, [rounds] * len(ids)))
+    return time.perf_counter() - start, latencies
+
+
+# ---------- async path ----------
+async def run_async(ids: list[int], total: int) -> tuple[float, list[float]]:
+    latencies: list[float] = []
+
+    async def worker(sid: int, rounds: int):
+        for i in range(rounds):
+            t0 = time.perf_counter()
+            async with AsyncWriteSessionLocal() as db:
+                await pause_session(sid, FocusTick(elapsed_sec=i + 1), db)
+            async with AsyncWriteSessionLocal() as db:
+                await resume_session(sid, db)
+            latencies.append(time.perf_counter() - t0)
+
+    rounds = max(total // len(ids), 1)
+    start = time.perf_counter()
+    await asyncio.gather(*(worker(sid, rounds) for sid in ids))
+    elapsed = time.perf_counter() - start
+    await async_engine.dispose()  # aiosqlite/asyncpg connections are bound to this loop
+    return elapsed, latencies
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("-c", "--concurrency", type=int, default=50)
+    parser.add_argument("-n", "--requests", type=int, default=1000, help="pause+resume round trips per mode")
+    args = parser.parse_args()
+
+    for label, runner in (
+        ("sync ", lambda ids: run_sync(ids, args.requests)),
+        ("async", lambda ids: asyncio.run(run_async(ids, args.requests))),
+    ):
+        ids = _seed(args.concurrency)
+        elapsed, latencies = runner(ids)
+        stats = _percentiles(latencies)
+        print(
+            f"{label}  concurrency={args.concurrency:<4} ops={len(latencies):<6} "
+            f"throughput={len(latencies) / elapsed:8.1f}/s  "
+            f"p50={stats['p50_ms']:7.2f}ms  p95={stats['p95_ms']:7.2f}ms"
+        )
+
+
+if __name__ == "__main__":
+    main()
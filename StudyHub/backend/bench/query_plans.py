@@ -0,0 +1,210 @@
+"""EXPLAIN-based plan regression check for the router queries.
+
+Seeds a database, drives every read path of the focus, goals and
+challenges routes through the app, and EXPLAINs each filtered SELECT the
+routes issue. Exits non-zero when any of them falls back to a sequential
+scan of a table, i.e. when no index can serve its WHERE clause.
+
+    python -m backend.bench.query_plans                      # throwaway SQLite file
+    DATABASE_URL=postgresql://... python -m backend.bench.query_plans
+
+On Postgres the check runs with enable_seqscan=off, so a "Seq Scan" in
+the plan means the planner had no usable index at all, regardless of how
+small the seeded tables are.
+"""
+import os
+import tempfile
+
+_DEFAULT_DB = os.path.join(tempfile.gettempdir(), "studyhub_plans.db")
+if "DATABASE_URL" not in os.environ:
+    for suffix in ("", "-wal", "-shm"):
+        if os.path.exists(_DEFAULT_DB + suffix):
+            os.remove(_DEFAULT_DB + suffix)
+    os.environ["DATABASE_URL"] = f"sqlite:///{_DEFAULT_DB}"
+os.environ.setdefault("BCRYPT_ROUNDS", "4")
+os.environ.setdefault("ADMISSION_ENABLED", "0")    # many reads from one test client
+
+import random
+import re
+import sys
+from datetime import datetime, timedelta
+
+from fastapi.testclient import TestClient
+from sqlalchemy import event, insert, text
+
+from ..database import SessionLocal, async_engine, engine
+from ..focusStats import rebuild_daily_stats
+from ..main import app
+from ..migrations import upgrade
+from ..models import Challenge, Comment, FocusSession, Goal, SessionStatus, User
+
+SEED_USERS = 50
+SEED_SESSIONS = 20_000
+SEED_GOALS = 5_000
+SEED_CHALLENGES = 500
+SEED_COMMENTS = 5_000
+
+_TABLES = ("users", "goals", "focus_sessions", "focus_daily_stats", "challenges", "challenge_tasks", "comments")
+_SQLITE_SCAN = re.compile(r"^SCAN (\w+?)(?:_\d+)?(?: AS \w+)?(?: LEFT-JOIN)?$")  # "_1" = ORM alias
+_PG_SEQ_SCAN = re.compile(r"Seq Scan on (\w+)")
+_FILTERED_SELECT = re.compile(r"\s*SELECT\b.*\bWHERE\b", re.IGNORECASE | re.DOTALL)
+
+
+def seed():
+    upgrade(engine)
+    rng = random.Random(7)
+    now = datetime.utcnow()
+    statuses = list(SessionStatus)
+    with engine.begin() as conn:
+        conn.execute(insert(User), [
+            {"id": i, "name": f"user {i}", "email": f"user{i}@example.com", "password": "x"}
+            for i in range(1, SEED_USERS + 1)
+        ])
+        conn.execute(insert(FocusSession), [
+            {
+                "user_id": rng.randint(1, SEED_USERS),
+                "title": "seed",
+                "duration_min": 25,
+                "elapsed_sec": rng.uniform(0, 1500),
+                "status": rng.choice(statuses),
+                "started_at": now - timedelta(minutes=rng.randint(0, 60 * 24 * 90)),
+                "updated_at": now,
+            }
+            for _ in range(SEED_SESSIONS)
+        ])
+        conn.execute(insert(Goal), [
+            {
+                "user_id": rng.randint(1, SEED_USERS),
+                "title": "seed",
+                "completed": rng.random() < 0.5,
+                "date": (now - timedelta(days=rng.randint(0, 90))).date(),
+            }
+            for _ in range(SEED_GOALS)
+        ])
+        conn.execute(insert(Challenge), [
+            {
+                "title": f"challenge {i}",
+                "creator_name": "seed",
+                "creator_id": rng.randint(1, SEED_USERS),
+                "level": rng.choice(["easy", "medium", "hard"]),
+                "start_date": "2025-01-01",
+                "end_date": "2025-12-31",
+                "max_participants": 10,
+            }
+            for i in range(SEED_CHALLENGES)
+        ])
+        conn.execute(insert(Comment), [
+            {
+                "challenge_id": rng.randint(1, 10),
+                "user_id": rng.randint(1, SEED_USERS),
+                "user_name": "seed",
+                "content": "seed",
+                "created_at": now - timedelta(minutes=rng.randint(0, 60 * 24 * 30)),
+            }
+            for _ in range(SEED_COMMENTS)
+        ])
+        conn.execute(text("ANALYZE"))
+    with SessionLocal() as db:
+        rebuild_daily_stats(db)
+
+
+# ---------- plan capture ----------
+class PlanRecorder:
+    def __init__(self):
+        self.label = None
+        self.plans = []   # [(label, statement, plan_lines)]
+
+    def install(self, sync_engine):
+        event.listen(sync_engine, "before_cursor_execute", self._explain)
+
+    def _explain(self, conn, cursor, statement, parameters, context, executemany):
+        if self.label is None or executemany:
+            return
+        if not _FILTERED_SELECT.match(statement):
+            return
+        if conn.dialect.name == "sqlite":
+            cursor.execute("EXPLAIN QUERY PLAN " + statement, parameters)
+            lines = [row[3] for row in cursor.fetchall()]
+        else:
+            cursor.execute("SET enable_seqscan = off")
+            cursor.execute("EXPLAIN " + statement, parameters)
+            lines = [row[0] for row in cursor.fetchall()]
+        self.plans.append((self.label, statement, lines))
+
+
+def sequential_scans(dialect: str, lines: list[str]) -> list[str]:
+    found = []
+    for line in lines:
+        if dialect == "sqlite":
+            match = _SQLITE_SCAN.match(line.strip())
+        else:
+            match = _PG_SEQ_SCAN.search(line)
+        if match and match.group(1) in _TABLES:
+            found.append(match.group(1))
+    return found
+
+
+def router_reads(client: TestClient):
+    """(label, path, params) for every read path worth guarding."""
+    today = datetime.utcnow().date()
+    week_ago = datetime.utcnow() - timedelta(days=7)
+    first = client.get("/focus/sessions", params={"user_id": 3, "limit": 20})
+    cursor = first.headers.get("X-Next-Cursor")
+    goals_page = client.get("/api/goals/3", params={"limit": 20})
+    goals_cursor = goals_page.headers.get("X-Next-Cursor")
+    comments_page = client.get("/api/challenges/5/comments", params={"limit": 20})
+    comments_cursor = comments_page.headers.get("X-Next-Cursor")
+    return [
+        ("list_sessions user", "/focus/sessions", {"user_id": 3, "limit": 20}),
+        ("list_sessions user+cursor", "/focus/sessions", {"user_id": 3, "limit": 20, "cursor": cursor}),
+        ("list_sessions user+range", "/focus/sessions", {"user_id": 3, "started_from": week_ago.isoformat()}),
+        ("list_sessions user+status", "/focus/sessions", {"user_id": 3, "status": "running"}),
+        ("daily_summary user", "/focus/summary", {"user_id": 3, "day": today.isoformat()}),
+        ("daily_summary all", "/focus/summary", {"day": today.isoformat()}),
+        ("focus_status", "/focus/status", {"user_id": 3}),
+        ("focus_analytics user", "/focus/analytics", {"user_id": 3, "date_from": (today - timedelta(days=89)).isoformat()}),
+        ("get_user_goals", "/api/goals/3", {"limit": 20}),
+        ("get_user_goals cursor", "/api/goals/3", {"limit": 20, "cursor": goals_cursor}),
+        ("get_user_goals range", "/api/goals/3", {"date_from": (today - timedelta(days=6)).isoformat(), "limit": 20}),
+        ("goal_calendar", "/api/goals/3/calendar", {"year": today.year, "month": today.month}),
+        ("get_challenges level", "/api/challenges", {"level": "hard", "limit": 20}),
+        ("get_challenges creator", "/api/challenges", {"creator_id": 3, "limit": 20}),
+        ("get_challenges cursor", "/api/challenges", {"limit": 20, "cursor": "WzIwXQ"}),
+        ("get_challenges summary", "/api/challenges", {"view": "summary", "level": "hard", "limit": 20}),
+        ("get_challenge", "/api/challenges/5", {}),
+        ("get_joined_challenges", "/api/challenges/joined", {"user_id": 3, "limit": 20}),
+        ("get_comments", "/api/challenges/5/comments", {"limit": 20}),
+        ("get_comments cursor", "/api/challenges/5/comments", {"limit": 20, "cursor": comments_cursor}),
+    ]
+
+
+def main() -> int:
+    seed()
+    recorder = PlanRecorder()
+    recorder.install(engine)
+    recorder.install(async_engine.sync_engine)
+
+    with TestClient(app) as client:
+        for label, path, params in router_reads(client):
+            recorder.label = label
+            response = client.get(path, params={k: v for k, v in params.items() if v is not None})
+            recorder.label = None
+            if response.status_code >= 500:
+                print(f"ERROR {label}: HTTP {response.status_code}")
+                return 2
+
+    dialect = engine.dialect.name
+    failures = 0
+    for label, statement, lines in recorder.plans:
+        scans = sequential_scans(dialect, lines)
+        status = "FAIL" if scans else "ok  "
+        failures += bool(scans)
+        print(f"{status} {label}: " + " | ".join(line.strip() for line in lines))
+        if scans:
+            print("     " + " ".join(statement.split())[:300])
+    print(f"\n{len(recorder.plans)} statements checked, {failures} with sequential scans")
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
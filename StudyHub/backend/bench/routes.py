@@ -0,0 +1,249 @@
+"""Route-level latency benchmark with regression thresholds.
+
+Runs the app in-process (httpx over ASGI, no sockets) and drives every
+route at a fixed concurrency. Each virtual user registers, logs in, works
+through goals CRUD, a full focus-session lifecycle, and challenge
+join/tasks/comments/leave, for a number of iterations.
+
+    python -m backend.bench.routes -c 20 -i 10
+    python -m backend.bench.routes --save-baseline backend/bench/baseline.json
+    python -m backend.bench.routes --baseline backend/bench/baseline.json --margin 0.25
+    DATABASE_URL=postgresql://... python -m backend.bench.routes
+
+It prints p50/p95/p99 and the request count per route, plus overall
+throughput. With --baseline, it exits 1 when a route's p95 (or the total
+throughput) is worse than the baseline by more than --margin. Tiny
+absolute differences below --min-delta-ms are ignored as noise. It exits
+2 on any non-2xx response.
+
+BCRYPT_ROUNDS defaults to 4 here so that register/login measure the
+route rather than bcrypt. Set it explicitly to benchmark the real cost.
+"""
+import os
+import tempfile
+
+_DEFAULT_DB = os.path.join(tempfile.gettempdir(), "studyhub_routes.db")
+if "DATABASE_URL" not in os.environ:
+    for suffix in ("", "-wal", "-shm"):
+        if os.path.exists(_DEFAULT_DB + suffix):
+            os.remove(_DEFAULT_DB + suffix)
+    os.environ["DATABASE_URL"] = f"sqlite:///{_DEFAULT_DB}"
+os.environ.setdefault("BCRYPT_ROUNDS", "4")
+os.environ.setdefault("ADMISSION_ENABLED", "0")    # measure the routes, not the rate limits
+
+import argparse
+import asyncio
+import json
+import statistics
+import sys
+import time
+import uuid
+from collections import defaultdict
+
+import httpx
+
+from ..database import async_engine
+from ..main import app
+
+CHALLENGES = 5            # shared challenges the virtual users join
+TASKS = ["read", "practice", "review"]
+
+
+class Recorder:
+    def __init__(self):
+        self.latencies = defaultdict(list)   # route label -> [seconds]
+        self.errors = defaultdict(int)
+
+    async def call(self, client: httpx.AsyncClient, label: str, method: str, url: str, **kwargs) -> httpx.Response:
+        started = time.perf_counter()
+        response = await client.request(method, url, **kwargs)
+        self.latencies[label].append(time.perf_counter() - started)
+        if response.status_code >= 300:
+            self.errors[f"{label} -> {response.status_code}"] += 1
+        return response
+
+
+async def virtual_user(client: httpx.AsyncClient, rec: Recorder, challenge_ids: list[int], worker: int, iterations: int):
+    email = f"bench-{uuid.uuid4().hex[:12]}@example.com"
+    user = (await rec.call(client, "POST /api/register", "POST", "/api/register",
+                           json={"name": f"bench {worker}", "email": email, "password": "secret"})).json()
+    user_id = user["id"]
+    cid = challenge_ids[worker % len(challenge_ids)]
+    await rec.call(client, "POST /api/challenges/{id}/join", "POST", f"/api/challenges/{cid}/join",
+                   params={"user_id": user_id})
+
+    for i in range(iterations):
+        await rec.call(client, "POST /api/login", "POST", "/api/login", json={"email": email, "password": "secret"})
+
+        # goals CRUD
+        goal = (await rec.call(client, "POST /api/goals", "POST", "/api/goals", json={
+            "title": f"goal {i}", "date": f"2025-01-{i % 28 + 1:02d}", "user_id": user_id,
+        })).json()
+        await rec.call(client, "PUT /api/goals/{id}", "PUT", f"/api/goals/{goal['id']}")
+        await rec.call(client, "GET /api/goals/{user_id}", "GET", f"/api/goals/{user_id}", params={"limit": 20})
+        await rec.call(client, "GET /api/goals/{user_id}/calendar", "GET", f"/api/goals/{user_id}/calendar",
+                       params={"year": 2025, "month": 2})
+        batch = (await rec.call(client, "POST /api/goals/batch", "POST", "/api/goals/batch", json={
+            "user_id": user_id, "goals": [{"title": f"batch {i}.{k}", "date": "2025-02-01"} for k in range(5)],
+        })).json()
+        ids = [r["id"] for r in batch["results"]]
+        await rec.call(client, "POST /api/goals/batch/toggle", "POST", "/api/goals/batch/toggle",
+                       json={"user_id": user_id, "ids": ids})
+        await rec.call(client, "POST /api/goals/batch/delete", "POST", "/api/goals/batch/delete",
+                       json={"user_id": user_id, "ids": ids})
+
+        # focus-session lifecycle
+        sess = (await rec.call(client, "POST /focus/sessions", "POST", "/focus/sessions",
+                               json={"title": "bench", "duration_min": 25, "user_id": user_id})).json()
+        sid = sess["id"]
+        await rec.call(client, "POST /focus/sessions/{id}/start", "POST", f"/focus/sessions/{sid}/start")
+        await rec.call(client, "GET /focus/status", "GET", "/focus/status", params={"user_id": user_id})
+        await rec.call(client, "POST /focus/sessions/{id}/pause", "POST", f"/focus/sessions/{sid}/pause")
+        await rec.call(client, "POST /focus/sessions/{id}/resume", "POST", f"/focus/sessions/{sid}/resume")
+        await rec.call(client, "POST /focus/sessions/{id}/complete", "POST", f"/focus/sessions/{sid}/complete")
+        await rec.call(client, "GET /focus/sessions", "GET", "/focus/sessions", params={"user_id": user_id, "limit": 20})
+        await rec.call(client, "GET /focus/summary", "GET", "/focus/summary", params={"user_id": user_id})
+        await rec.call(client, "GET /focus/analytics", "GET", "/focus/analytics",
+                       params={"user_id": user_id, "granularity": "week"})
+        await rec.call(client, "GET /focus/leaderboard", "GET", "/focus/leaderboard", params={"limit": 20})
+        await rec.call(client, "GET /focus/leaderboard/rank", "GET", "/focus/leaderboard/rank",
+                       params={"user_id": user_id, "challenge_id": cid})
+
+        # challenges
+        await rec.call(client, "GET /api/challenges", "GET", "/api/challenges", params={"limit": 20})
+        await rec.call(client, "GET /api/challenges?view=summary", "GET", "/api/challenges",
+                       params={"view": "summary", "limit": 20})
+        await rec.call(client, "GET /api/challenges/{id}", "GET", f"/api/challenges/{cid}")
+        await rec.call(client, "PATCH /api/challenges/{id}/tasks", "PATCH", f"/api/challenges/{cid}/tasks",
+                       params={"user_id": user_id},
+                       json=[{"title": t, "done": (i + k) % 2 == 0} for k, t in enumerate(TASKS)])
+        await rec.call(client, "POST /api/challenges/{id}/comments", "POST", f"/api/challenges/{cid}/comments",
+                       params={"user_id": user_id, "content": f"comment {i}"})
+        await rec.call(client, "GET /api/challenges/{id}/comments", "GET", f"/api/challenges/{cid}/comments",
+                       params={"limit": 20})
+        await rec.call(client, "GET /api/challenges/joined", "GET", "/api/challenges/joined",
+                       params={"user_id": user_id})
+
+    await rec.call(client, "DELETE /api/challenges/{id}/leave", "DELETE", f"/api/challenges/{cid}/leave",
+                   params={"user_id": user_id})
+
+
+def _percentile_ms(samples: list[float], pct: int) -> float:
+    if len(samples) == 1:
+        return samples[0] * 1000
+    return statistics.quantiles(samples, n=100, method="inclusive")[pct - 1] * 1000
+
+
+async def run(concurrency: int, iterations: int) -> dict:
+    rec = Recorder()
+    transport = httpx.ASGITransport(app=app)
+    async with app.router.lifespan_context(app):
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+            challenge_ids = []
+            for n in range(CHALLENGES):
+                created = await client.post("/api/challenges", json={
+                    "title": f"bench {n}", "creator_name": "bench",
+                    "max_participants": concurrency + 1, "tasks": TASKS,
+                })
+                challenge_ids.append(created.json()["id"])
+
+            # warm-up pass (pool connections, caches, imports) is not recorded
+            await asyncio.gather(*(
+                virtual_user(client, Recorder(), challenge_ids, worker, 1) for worker in range(concurrency)
+            ))
+            started = time.perf_counter()
+            await asyncio.gather(*(
+                virtual_user(client, rec, challenge_ids, worker, iterations) for worker in range(concurrency)
+            ))
+            wall = time.perf_counter() - started
+    await async_engine.dispose()
+
+    total = sum(len(v) for v in rec.latencies.values())
+    return {
+        "concurrency": concurrency,
+        "iterations": iterations,
+        "database": async_engine.dialect.name,
+        "requests": total,
+        "throughput_rps": round(total / wall, 1),
+        "errors": dict(rec.errors),
+        "routes": {
+            label: {
+                "count": len(samples),
+                "p50_ms": round(_percentile_ms(samples, 50), 3),
+                "p95_ms": round(_percentile_ms(samples, 95), 3),
+                "p99_ms": round(_percentile_ms(samples, 99), 3),
+            }
+            for label, samples in sorted(rec.latencies.items())
+        },
+    }
+
+
+def compare(result: dict, baseline: dict, margin: float, min_delta_ms: float) -> list[str]:
+    regressions = []
+    for label, base in baseline.get("routes", {}).items():
+        current = result["routes"].get(label)
+        if current is None:
+            continue
+        limit = base["p95_ms"] * (1 + margin)
+        if current["p95_ms"] > limit and current["p95_ms"] - base["p95_ms"] > min_delta_ms:
+            regressions.append(f"{label}: p95 {current['p95_ms']:.2f}ms > {base['p95_ms']:.2f}ms +{margin:.0%}")
+    floor = baseline.get("throughput_rps", 0) * (1 - margin)
+    if result["throughput_rps"] < floor:
+        regressions.append(
+            f"throughput {result['throughput_rps']:.1f}/s < {baseline['throughput_rps']:.1f}/s -{margin:.0%}"
+        )
+    return regressions
+
+
+def report(result: dict):
+    width = max(len(label) for label in result["routes"])
+    print(f"{'route':<{width}}  {'count':>6}  {'p50 ms':>8}  {'p95 ms':>8}  {'p99 ms':>8}")
+    for label, stats in result["routes"].items():
+        print(
+            f"{label:<{width}}  {stats['count']:>6}  {stats['p50_ms']:>8.2f}  "
+            f"{stats['p95_ms']:>8.2f}  {stats['p99_ms']:>8.2f}"
+        )
+    print(
+        f"\n{result['database']}  concurrency={result['concurrency']}  iterations={result['iterations']}  "
+        f"requests={result['requests']}  throughput={result['throughput_rps']:.1f}/s"
+    )
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("-c", "--concurrency", type=int, default=20, help="virtual users")
+    parser.add_argument("-i", "--iterations", type=int, default=10, help="scenario loops per user")
+    parser.add_argument("--baseline", help="JSON from --save-baseline to compare against")
+    parser.add_argument("--save-baseline", help="write this run's results as the new baseline")
+    parser.add_argument("--margin", type=float, default=0.25, help="allowed regression (0.25 = 25%%)")
+    parser.add_argument("--min-delta-ms", type=float, default=2.0, help="ignore p95 differences below this")
+    args = parser.parse_args()
+
+    result = asyncio.run(run(args.concurrency, args.iterations))
+    report(result)
+
+    if args.save_baseline:
+        with open(args.save_baseline, "w") as f:
+            json.dump(result, f, indent=2)
+        print(f"Baseline written to {args.save_baseline}")
+
+    if result["errors"]:
+        print("\nNon-2xx responses:")
+        for label, count in sorted(result["errors"].items()):
+            print(f"  {label}: {count}")
+        return 2
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        regressions = compare(result, baseline, args.margin, args.min_delta_ms)
+        for line in regressions:
+            print(f"REGRESSION {line}")
+        if regressions:
+            return 1
+        print(f"No regressions against {args.baseline} (margin {args.margin:.0%})")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
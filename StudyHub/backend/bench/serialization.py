@@ -0,0 +1,125 @@
+"""Serialization cost of a 10k-row list response, default path vs fast path.
+
+Seeds N focus sessions and goals into a throwaway SQLite file. For each
+list, it times query + serialization for:
+
+  orm+response_model   ORM instances validated against the response model,
+                       dumped to Python, then json.dumps (FastAPI's default path)
+  rows+RowSerializer   column tuples through the prebuilt TypedDict adapter
+  rows+orjson          column tuples as dicts through ORJSONResponse
+
+It also checks that all three paths produce the same JSON.
+
+    python -m backend.bench.serialization -n 10000
+"""
+import os
+import tempfile
+
+_DEFAULT_DB = os.path.join(tempfile.gettempdir(), "studyhub_serialization.db")
+if "DATABASE_URL" not in os.environ:
+    for suffix in ("", "-wal", "-shm"):
+        if os.path.exists(_DEFAULT_DB + suffix):
+            os.remove(_DEFAULT_DB + suffix)
+    os.environ["DATABASE_URL"] = f"sqlite:///{_DEFAULT_DB}"
+
+import argparse
+import json
+import sys
+import time
+from datetime import date, datetime, timedelta
+
+from fastapi.responses import ORJSONResponse
+from pydantic import TypeAdapter
+from sqlalchemy import insert, select
+
+from ..database import SessionLocal, engine
+from ..focusTime import _session_rows
+from ..main import _goal_rows
+from ..migrations import upgrade
+from ..models import FocusSession, Goal, SessionStatus, User
+from ..schemas import FocusResponse, GoalResponse
+
+
+def seed(count: int):
+    upgrade(engine)
+    now = datetime.utcnow()
+    with engine.begin() as conn:
+        conn.execute(insert(User).values(id=1, name="bench", email="bench@example.com", password="x"))
+        conn.execute(insert(FocusSession), [
+            {
+                "user_id": 1, "title": f"session {i}", "duration_min": 25, "elapsed_sec": i % 1500,
+                "pauses_count": i % 3, "did_pause": i % 3 > 0, "status": SessionStatus.completed,
+                "started_at": now - timedelta(minutes=i), "completed_at": now - timedelta(minutes=i) + timedelta(minutes=25),
+                "updated_at": now, "plant_growth": 1.0,
+            }
+            for i in range(count)
+        ])
+        conn.execute(insert(Goal), [
+            {"user_id": 1, "title": f"goal {i}", "completed": i % 2 == 0, "date": date(2025, 1, 1), "color": "#ffcc00"}
+            for i in range(count)
+        ])
+
+
+def _best(fn, repeat: int) -> tuple[float, bytes]:
+    best, body = float("inf"), b""
+    for _ in range(repeat):
+        with SessionLocal() as db:
+            started = time.perf_counter()
+            body = fn(db)
+            best = min(best, time.perf_counter() - started)
+    return best, body
+
+
+def paths(model, entity, serializer):
+    adapter = TypeAdapter(list[model])
+
+    def orm_response_model(db):
+        objs = db.scalars(select(entity).order_by(entity.id)).all()
+        data = adapter.dump_python(adapter.validate_python(objs, from_attributes=True), mode="json")
+        return json.dumps(data, ensure_ascii=False, separators=(",", ":")).encode()
+
+    def rows_serializer(db):
+        return serializer.dump(db.execute(select(*serializer.columns).order_by(entity.id)).all())
+
+    def rows_orjson(db):
+        rows = db.execute(select(*serializer.columns).order_by(entity.id)).all()
+        return ORJSONResponse([dict(zip(serializer.fields, row)) for row in rows]).body
+
+    return [
+        ("orm+response_model", orm_response_model),
+        ("rows+RowSerializer", rows_serializer),
+        ("rows+orjson", rows_orjson),
+    ]
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("-n", "--rows", type=int, default=10_000)
+    parser.add_argument("-r", "--repeat", type=int, default=5, help="best of R runs")
+    args = parser.parse_args()
+
+    seed(args.rows)
+    ok = True
+    for label, model, entity, serializer in (
+        ("list_sessions", FocusResponse, FocusSession, _session_rows),
+        ("get_user_goals", GoalResponse, Goal, _goal_rows),
+    ):
+        print(f"\n{label} ({args.rows} rows)")
+        results = []
+        for name, fn in paths(model, entity, serializer):
+            elapsed, body = _best(fn, args.repeat)
+            results.append((name, elapsed, body))
+        baseline = results[0][1]
+        reference = json.loads(results[0][2])
+        for name, elapsed, body in results:
+            same = json.loads(body) == reference
+            ok &= same
+            print(
+                f"  {name:<20} {elapsed * 1000:8.1f} ms  {baseline / elapsed:5.2f}x  "
+                f"{len(body) / 1024:7.0f} KiB  {'same output' if same else 'OUTPUT DIFFERS'}"
+            )
+    return 0 if ok else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,122 @@
+"""Per-request cost of identifying the caller: signed token vs user lookup.
+
+Two parts:
+
+  verify      in-process cost of token_user_id() per call: a cached token
+              (LRU hit), an uncached one (HMAC-SHA256), and for comparison
+              the `SELECT id FROM users WHERE id = ?` it replaces
+  POST goals  POST /api/goals over ASGI with only user_id in the body vs
+              with a Bearer token: p50/p95 and SQL statements per request
+
+    python -m backend.bench.tokens -n 20000 -r 500
+    DATABASE_URL=postgresql://... python -m backend.bench.tokens
+"""
+import os
+import tempfile
+
+_DEFAULT_DB = os.path.join(tempfile.gettempdir(), "studyhub_tokens.db")
+if "DATABASE_URL" not in os.environ:
+    for suffix in ("", "-wal", "-shm"):
+        if os.path.exists(_DEFAULT_DB + suffix):
+            os.remove(_DEFAULT_DB + suffix)
+    os.environ["DATABASE_URL"] = f"sqlite:///{_DEFAULT_DB}"
+os.environ.setdefault("BCRYPT_ROUNDS", "4")
+os.environ.setdefault("ADMISSION_ENABLED", "0")    # measure the routes, not the rate limits
+
+import argparse
+import asyncio
+import statistics
+import sys
+import time
+import uuid
+
+import httpx
+from sqlalchemy import select
+
+from .. import tokens as tokens_module
+from ..database import SessionLocal, async_engine
+from ..main import app
+from ..metrics import registry
+from ..models import User
+from ..tokens import TokenVerifier, issue_token, token_user_id
+
+
+def _per_call_us(fn, count: int) -> float:
+    started = time.perf_counter()
+    for i in range(count):
+        fn(i)
+    return (time.perf_counter() - started) / count * 1e6
+
+
+def verify_costs(user_id: int, count: int):
+    tokens = [f"Bearer {issue_token(user_id)[0]}" for _ in range(count)]
+    cached = tokens[0]
+    token_user_id(cached)
+
+    shared = tokens_module.verifier
+    tokens_module.verifier = TokenVerifier(max_entries=0)    # every call is a miss
+    try:
+        uncached = _per_call_us(lambda i: token_user_id(tokens[i]), count)
+    finally:
+        tokens_module.verifier = shared
+    hit = _per_call_us(lambda i: token_user_id(cached), count)
+
+    with SessionLocal() as db:
+        lookup = _per_call_us(
+            lambda i: db.scalar(select(User.id).where(User.id == user_id)), min(count, 2000)
+        )
+    print(f"\nverify ({count} calls)")
+    print(f"  token, LRU hit        {hit:8.2f} us/request")
+    print(f"  token, HMAC verify    {uncached:8.2f} us/request")
+    print(f"  SELECT user by id     {lookup:8.2f} us/request  ({async_engine.dialect.name})")
+
+
+def _statements(route: str) -> tuple[int, float]:
+    entry = registry.routes.get(("POST", route))
+    return (entry.statements.count, entry.statements.sum) if entry else (0, 0.0)
+
+
+async def post_goals(requests: int):
+    async with app.router.lifespan_context(app):
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+            email = f"{uuid.uuid4().hex[:12]}@bench.local"
+            await client.post("/api/register", json={"name": "bench", "email": email, "password": "benchpass"})
+            login = (await client.post("/api/login", json={"email": email, "password": "benchpass"})).json()
+            user_id, auth = login["id"], {"Authorization": f"Bearer {login['token']}"}
+
+            print(f"\nPOST /api/goals ({requests} requests each)")
+            for label, headers in (("user_id only", {}), ("Bearer token", auth)):
+                body = {"title": "bench", "date": "2025-01-01", "user_id": user_id}
+                await client.post("/api/goals", json=body, headers=headers)    # warm-up
+                count_before, sum_before = _statements("/api/goals")
+                samples = []
+                for _ in range(requests):
+                    started = time.perf_counter()
+                    response = await client.post("/api/goals", json=body, headers=headers)
+                    samples.append(time.perf_counter() - started)
+                    response.raise_for_status()
+                count_after, sum_after = _statements("/api/goals")
+                q = statistics.quantiles(samples, n=100, method="inclusive")
+                per_request = (sum_after - sum_before) / (count_after - count_before)
+                print(
+                    f"  {label:<14} p50={q[49] * 1000:7.3f}ms  p95={q[94] * 1000:7.3f}ms  "
+                    f"{per_request:.1f} SQL statements/request"
+                )
+    await async_engine.dispose()
+    return user_id
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("-n", "--verifications", type=int, default=20_000)
+    parser.add_argument("-r", "--requests", type=int, default=500, help="POST /api/goals per variant")
+    args = parser.parse_args()
+
+    user_id = asyncio.run(post_goals(args.requests))
+    verify_costs(user_id, args.verifications)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,127 @@
+"""Memory and throughput of the NDJSON export/import (backend.transfer).
+
+Seeds one user with each history size in turn, exports it through
+stream_export to a file, then imports that file onto a second user. For
+each step it reports rows/s and the tracemalloc peak. The peak should
+stay flat as the history grows: a size-dependent peak means rows are
+being buffered somewhere.
+
+    python -m backend.bench.transfer --sizes 10000,50000,200000
+    DATABASE_URL=postgresql://... python -m backend.bench.transfer
+"""
+import os
+import tempfile
+
+_DEFAULT_DB = os.path.join(tempfile.gettempdir(), "studyhub_transfer.db")
+if "DATABASE_URL" not in os.environ:
+    for suffix in ("", "-wal", "-shm"):
+        if os.path.exists(_DEFAULT_DB + suffix):
+            os.remove(_DEFAULT_DB + suffix)
+    os.environ["DATABASE_URL"] = f"sqlite:///{_DEFAULT_DB}"
+
+import argparse
+import sys
+import time
+import tracemalloc
+from datetime import date, datetime, timedelta
+
+from sqlalchemy import delete, insert, select
+
+from ..database import engine, write_engine
+from ..migrations import upgrade
+from ..models import FocusSession, Goal, SessionStatus, User
+from ..transfer import import_lines, stream_export
+
+SEED_BATCH = 5000
+
+
+def _user(conn, email: str) -> int:
+    user_id = conn.scalar(select(User.id).where(User.email == email))
+    if user_id is None:
+        user_id = conn.scalar(
+            insert(User).values(name="bench", email=email, password="x").returning(User.id)
+        )
+    return user_id
+
+
+def _seed(conn, user_id: int, size: int):
+    """size rows split evenly between completed sessions and goals."""
+    conn.execute(delete(FocusSession).where(FocusSession.user_id == user_id))
+    conn.execute(delete(Goal).where(Goal.user_id == user_id))
+    start = datetime(2024, 1, 1, 8)
+    for offset in range(0, size // 2, SEED_BATCH):
+        count = min(SEED_BATCH, size // 2 - offset)
+        conn.execute(insert(FocusSession), [
+            {
+                "user_id": user_id, "title": f"bench {i}", "duration_min": 25, "elapsed_sec": 1500.0,
+                "pauses_count": 0, "did_pause": False, "status": SessionStatus.completed,
+                "started_at": start + timedelta(hours=i), "resumed_at": None,
+                "completed_at": start + timedelta(hours=i, minutes=25),
+                "updated_at": start + timedelta(hours=i, minutes=25), "plant_growth": 1.0,
+            }
+            for i in range(offset, offset + count)
+        ])
+        conn.execute(insert(Goal), [
+            {"user_id": user_id, "title": f"goal {i}", "completed": i % 2 == 0,
+             "date": date(2024, 1, 1) + timedelta(days=i % 365), "color": None}
+            for i in range(offset, offset + count)
+        ])
+
+
+def _measured(fn):
+    tracemalloc.start()
+    started = time.perf_counter()
+    try:
+        result = fn()
+    finally:
+        elapsed = time.perf_counter() - started
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+    return result, elapsed, peak
+
+
+def _export(user_id: int, path: str) -> int:
+    lines = 0
+    with open(path, "wb") as out:
+        for chunk in stream_export(engine, user_id):
+            lines += chunk.count(b"\n")
+            out.write(chunk)
+    return lines - 1    # header
+
+
+def _import(target_id: int, path: str) -> int:
+    with open(path, "rb") as source:
+        summary = import_lines(write_engine, source, target_id)
+    return sum(summary["imported"].values())
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes", default="10000,50000,200000", help="rows per user (sessions + goals)")
+    args = parser.parse_args()
+
+    upgrade(engine)
+    with engine.begin() as conn:
+        source_id = _user(conn, "transfer-source@bench.local")
+        target_id = _user(conn, "transfer-target@bench.local")
+    path = os.path.join(tempfile.gettempdir(), "studyhub_transfer.ndjson")
+
+    print(f"{'rows':>8}  {'export rows/s':>13} {'peak':>9}  {'import rows/s':>13} {'peak':>9}  ({engine.dialect.name})")
+    for size in (int(part) for part in args.sizes.split(",")):
+        with engine.begin() as conn:
+            _seed(conn, source_id, size)
+            conn.execute(delete(FocusSession).where(FocusSession.user_id == target_id))
+            conn.execute(delete(Goal).where(Goal.user_id == target_id))
+        exported, export_sec, export_peak = _measured(lambda: _export(source_id, path))
+        imported, import_sec, import_peak = _measured(lambda: _import(target_id, path))
+        assert exported == imported == size // 2 * 2, (exported, imported)
+        print(
+            f"{size:>8}  {exported / export_sec:>13,.0f} {export_peak / 1024:>7.0f}KB  "
+            f"{imported / import_sec:>13,.0f} {import_peak / 1024:>7.0f}KB"
+        )
+    os.remove(path)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
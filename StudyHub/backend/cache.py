@@ -0,0 +1,140 @@
+import hashlib
+import os
+import time
+from collections import OrderedDict
+from threading import Lock
+
+from fastapi import Request, Response
+
+# ============================================================
+# Settings
+# ============================================================
+CHALLENGE_CACHE_SIZE = int(os.getenv("CHALLENGE_CACHE_SIZE", "1024"))   # cached responses
+CHALLENGE_CACHE_TTL = float(os.getenv("CHALLENGE_CACHE_TTL", "30"))     # seconds
+
+LIST_SCOPE = "list"   # version scope shared by every list response
+
+
+class _Entry:
+    __slots__ = ("version", "expires", "body", "etag", "headers")
+
+    def __init__(self, version, expires, body, etag, headers):
+        self.version = version
+        self.expires = expires
+        self.body = body
+        self.etag = etag
+        self.headers = headers
+
+
+class ResponseCache:
+    """Bounded LRU + TTL cache of serialized JSON responses.
+
+    Every entry is stamped with the version of the scope it was built
+    from (a challenge id, or LIST_SCOPE for list pages). Writers call
+    `invalidate(id)` after commit, which bumps that challenge's version and
+    the list version, so stale entries miss on their next lookup. The
+    version is read *before* loading from the database: a write that
+    commits while a response is being built leaves it stamped with the old
+    version, and it is never served.
+
+    The cache is per process; with several workers, the TTL bounds how
+    long another worker's write can go unseen.
+    """
+
+    def __init__(self, max_entries: int, ttl: float):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._lock = Lock()
+        self._entries: OrderedDict = OrderedDict()
+        self._versions: dict = {}
+        self.hits = 0
+        self.misses = 0
+        self.not_modified = 0
+        self.invalidations = 0
+        self.evictions = 0
+
+    def version(self, scope) -> int:
+        with self._lock:
+            return self._versions.get(scope, 0)
+
+    def invalidate(self, challenge_id: int | None = None):
+        """Drop responses built from `challenge_id` (or just the lists)."""
+        with self._lock:
+            self.invalidations += 1
+            self._versions[LIST_SCOPE] = self._versions.get(LIST_SCOPE, 0) + 1
+            if challenge_id is not None:
+                self._versions[challenge_id] = self._versions.get(challenge_id, 0) + 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._versions.clear()
+
+    def _lookup(self, key, version) -> _Entry | None:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry.version == version and entry.expires > time.monotonic():
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry
+            if entry is not None:
+                del self._entries[key]
+            self.misses += 1
+            return None
+
+    def _store(self, key, entry: _Entry):
+        with self._lock:
+            self._entries[key] = entry
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def respond(self, request: Request, key, scope, load, serialize, response: Response | None = None) -> Response:
+        """Serve `key` from cache, or build it with `serialize(load())`.
+
+        `load` may raise HTTPException (e.g. 404); errors are not cached.
+        Headers that `load` sets on `response` (such as the next-page
+        cursor) are cached with the body.
+        """
+        version = self.version(scope)
+        entry = self._lookup(key, version)
+        if entry is None:
+            body = serialize(load())
+            etag = '"' + hashlib.blake2b(body, digest_size=16).hexdigest() + '"'
+            headers = dict(response.headers) if response is not None else {}
+            headers.pop("content-length", None)
+            entry = _Entry(version, time.monotonic() + self.ttl, body, etag, headers)
+            self._store(key, entry)
+
+        headers = {**entry.headers, "ETag": entry.etag, "Cache-Control": "no-cache"}
+        if _etag_matches(request.headers.get("if-none-match"), entry.etag):
+            with self._lock:
+                self.not_modified += 1
+            return Response(status_code=304, headers=headers)
+        return Response(content=entry.body, media_type="application/json", headers=headers)
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+                "ttl_sec": self.ttl,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+                "not_modified": self.not_modified,
+                "invalidations": self.invalidations,
+                "evictions": self.evictions,
+            }
+
+
+def _etag_matches(if_none_match: str | None, etag: str) -> bool:
+    if not if_none_match:
+        return False
+    candidates = [tag.strip() for tag in if_none_match.split(",")]
+    return "*" in candidates or etag in candidates or f"W/{etag}" in candidates
+
+
+challenge_cache = ResponseCache(CHALLENGE_CACHE_SIZE, CHALLENGE_CACHE_TTL)
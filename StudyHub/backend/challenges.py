@@ -1,28 +1,51 @@
-from fastapi import APIRouter, Depends, HTTPException, Query
+import json
+import os
+
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response
+from fastapi.responses import ORJSONResponse, StreamingResponse
+from pydantic import TypeAdapter
+from sqlalchemy import Numeric, and_, case, cast, delete, func, or_, select, update
 from sqlalchemy.orm import Session
+from sqlalchemy.orm.attributes import set_committed_value
 from . import models, schemas
-from .database import SessionLocal
-import json
-from typing import List
+from .cache import LIST_SCOPE, challenge_cache
+from .database import AsyncSessionLocal, dialect_insert, get_db
+from .leaderboard import leaderboards
+from .pagination import cursor_param, decode_cursor, fetch_limit, limit_param, page_limit, paginate, parse_cursor_datetime
+from .pubsub import TooManySubscribers, get_broker
+from .serialization import RowSerializer
+from datetime import datetime
+from typing import List, Literal, Union
 
 
 router = APIRouter(prefix="/api/challenges", tags=["challenges"])
 
-# ============================================================
-# Database Dependency
-# ============================================================
-def get_db():
-    db = SessionLocal()
-    try:
-        yield db
-    finally:
-        db.close()
+SSE_HEARTBEAT_SEC = float(os.getenv("SSE_HEARTBEAT_SEC", "15"))
+
+# Reads are served from challenge_cache as pre-serialized JSON; every
+# write below calls challenge_cache.invalidate() after it commits.
+_challenge_adapter = TypeAdapter(schemas.ChallengeResponse)
+_challenge_list_adapter = TypeAdapter(List[schemas.ChallengeResponse])
+
+
+def _challenge_json(challenge) -> bytes:
+    return _challenge_adapter.dump_json(_challenge_adapter.validate_python(challenge, from_attributes=True))
+
+
+def _challenge_list_json(challenges) -> bytes:
+    return _challenge_list_adapter.dump_json(_challenge_list_adapter.validate_python(challenges, from_attributes=True))
 
 # ============================================================
 # 🏁 Create Challenge
 # ============================================================
 @router.post("", response_model=schemas.ChallengeResponse)
 def create_challenge(challenge: schemas.ChallengeCreate, db: Session = Depends(get_db)):
+    member_ids = list(dict.fromkeys(challenge.participants or []))
+    members = [
+        models.ChallengeParticipant(user_id=uid, progress=(challenge.progress or {}).get(str(uid), 0.0))
+        for uid in member_ids
+    ]
+    progress_sum = sum(m.progress for m in members)
     new_challenge = models.Challenge(
         title=challenge.title,
         description=challenge.description,
@@ -31,67 +54,164 @@ def create_challenge(challenge: schemas.ChallengeCreate, db: Session = Depends(g
         creator_id=challenge.creator_id,
         start_date=challenge.start_date,
         end_date=challenge.end_date,
-        participants=challenge.participants or [],
+        participant_count=len(members),
+        progress_sum=progress_sum,
+        members=members,
         max_participants=challenge.max_participants,
-        tasks=challenge.tasks or [],
-        progress=challenge.progress or {},
-        group_progress=challenge.group_progress or 0
+        tasks=[models.ChallengeTask(title=t) for t in challenge.tasks or []],
+        group_progress=round(progress_sum / len(members), 2) if members else 0.0
     )
     db.add(new_challenge)
+    db.flush()
+    # built before commit, which would expire the row and reload it in a new transaction
+    response = schemas.ChallengeResponse.model_validate(new_challenge, from_attributes=True)
     db.commit()
-    db.refresh(new_challenge)
-    return new_challenge
+    challenge_cache.invalidate()
+    return response
 
 # ============================================================
 # 📋 Get All Challenges
 # ============================================================
-@router.get("", response_model=List[schemas.ChallengeResponse])
-def get_challenges(db: Session = Depends(get_db)):
-    challenges = db.query(models.Challenge).all()
-    return challenges
+@router.get("", response_model=List[Union[schemas.ChallengeResponse, schemas.ChallengeSummary]])
+def get_challenges(
+    request: Request,
+    response: Response,
+    level: str | None = None,
+    creator_id: int | None = None,
+    starts_from: str | None = Query(None, description="Only challenges starting on/after YYYY-MM-DD"),
+    ends_by: str | None = Query(None, description="Only challenges ending on/before YYYY-MM-DD"),
+    view: Literal["full", "summary"] = Query(
+        "full", description="summary: card columns plus participants_count/tasks_count only"
+    ),
+    cursor: str | None = cursor_param(),
+    limit: int | None = limit_param(None),
+    db: Session = Depends(get_db),
+):
+    conditions = _list_conditions(level, creator_id, starts_from, ends_by, cursor)
+    limit = page_limit(limit, cursor)    # the Challenges page lists everything unpaged
+    if view == "summary":
+        def load():
+            q = select(*_summary_rows.columns).where(*conditions).order_by(models.Challenge.id).limit(fetch_limit(limit))
+            return paginate(db.execute(q).all(), limit, response, key=lambda c: (c.id,))
+        serialize = _summary_rows.dump
+    else:
+        def load():
+            q = db.query(models.Challenge).filter(*conditions).order_by(models.Challenge.id).limit(fetch_limit(limit))
+            return paginate(q.all(), limit, response, key=lambda c: (c.id,))
+        serialize = _challenge_list_json
+
+    key = ("list", view, level, creator_id, starts_from, ends_by, cursor, limit)
+    return challenge_cache.respond(request, key, LIST_SCOPE, load, serialize, response)
+
+
+def _list_conditions(level, creator_id, starts_from, ends_by, cursor) -> list:
+    conditions = []
+    if level is not None:
+        conditions.append(models.Challenge.level == level)
+    if creator_id is not None:
+        conditions.append(models.Challenge.creator_id == creator_id)
+    if starts_from is not None:
+        conditions.append(models.Challenge.start_date >= starts_from)
+    if ends_by is not None:
+        conditions.append(models.Challenge.end_date <= ends_by)
+    if cursor:
+        (after_id,) = decode_cursor(cursor, int)
+        conditions.append(models.Challenge.id > after_id)
+    return conditions
+
+
+# card columns: participant count is the maintained column, task count a
+# correlated COUNT served by ix_challenge_tasks_challenge_id
+_summary_rows = RowSerializer(
+    schemas.ChallengeSummary,
+    models.Challenge.__table__,
+    participants_count=models.Challenge.participant_count.label("participants_count"),
+    tasks_count=select(func.count(models.ChallengeTask.id))
+    .where(models.ChallengeTask.challenge_id == models.Challenge.id)
+    .correlate(models.Challenge)
+    .scalar_subquery()
+    .label("tasks_count"),
+)
+
+# ============================================================
+# 🙋 Challenges a User Joined
+# ============================================================
+@router.get("/joined", response_model=List[schemas.ChallengeResponse])
+def get_joined_challenges(
+    response: Response,
+    user_id: int = Query(...),
+    cursor: str | None = cursor_param(),
+    limit: int = limit_param(),
+    db: Session = Depends(get_db),
+):
+    q = (
+        db.query(models.Challenge)
+        .join(models.ChallengeParticipant)
+        .filter(models.ChallengeParticipant.user_id == user_id)
+    )
+    if cursor:
+        (after_id,) = decode_cursor(cursor, int)
+        q = q.filter(models.ChallengeParticipant.challenge_id > after_id)
+    challenges = q.order_by(models.ChallengeParticipant.challenge_id).limit(limit + 1).all()
+    return paginate(challenges, limit, response, key=lambda c: (c.id,))
 
 # ============================================================
 # 🔍 Get Single Challenge by ID
 # ============================================================
 @router.get("/{challenge_id}", response_model=schemas.ChallengeResponse)
-def get_challenge(challenge_id: int, db: Session = Depends(get_db)):
-    challenge = db.query(models.Challenge).filter(models.Challenge.id == challenge_id).first()
-    if not challenge:
-        raise HTTPException(status_code=404, detail="Challenge not found")
-    return challenge
+def get_challenge(challenge_id: int, request: Request, db: Session = Depends(get_db)):
+    def load():
+        challenge = db.query(models.Challenge).filter(models.Challenge.id == challenge_id).first()
+        if not challenge:
+            raise HTTPException(status_code=404, detail="Challenge not found")
+        return challenge
+
+    return challenge_cache.respond(request, ("challenge", challenge_id), challenge_id, load, _challenge_json)
 
 # ============================================================
 # 🤝 Join Challenge
 # ============================================================
 @router.post("/{challenge_id}/join")
 def join_challenge(challenge_id: int, user_id: int = Query(...), db: Session = Depends(get_db)):
-    challenge = db.query(models.Challenge).filter(models.Challenge.id == challenge_id).first()
-    if not challenge:
-        raise HTTPException(status_code=404, detail="Challenge not found")
-
-    # Convert to list if needed
-    participants = challenge.participants or []
-
-    if user_id in participants:
-        raise HTTPException(status_code=400, detail="User already joined this challenge")
-
-    if len(participants) >= challenge.max_participants:
+    # Claim a seat first: the conditional UPDATE row-locks the challenge, so
+    # concurrent joins serialize here and can never overshoot max_participants.
+    # A new member starts at 0%, so only the count changes the average.
+    claimed = db.execute(
+        update(models.Challenge)
+        .where(
+            models.Challenge.id == challenge_id,
+            models.Challenge.participant_count < models.Challenge.max_participants,
+        )
+        .values(
+            participant_count=models.Challenge.participant_count + 1,
+            group_progress=_group_average(models.Challenge.participant_count + 1),
+        )
+        .returning(models.Challenge.participant_count, models.Challenge.group_progress)
+        .execution_options(synchronize_session=False)
+    ).first()
+    if claimed is None:
+        db.rollback()
+        if db.get(models.Challenge, challenge_id) is None:
+            raise HTTPException(status_code=404, detail="Challenge not found")
+        if db.get(models.ChallengeParticipant, (challenge_id, user_id)) is not None:
+            raise HTTPException(status_code=400, detail="User already joined this challenge")
         raise HTTPException(status_code=400, detail="This challenge is already full")
 
-    participants.append(user_id)
-    challenge.participants = participants
-    progress_map = challenge.progress or {}
-    progress_map[str(user_id)] = 0.0
-    challenge.progress = progress_map
-
-    # recompute group progress
-    progresses = list(progress_map.values())
-    challenge.group_progress = (
-        round(sum(progresses) / len(progresses), 2) if progresses else 0.0
-    )
+    insert = dialect_insert(db.bind.dialect.name)
+    inserted = db.execute(
+        insert(models.ChallengeParticipant)
+        .values(challenge_id=challenge_id, user_id=user_id, progress=0.0)
+        .on_conflict_do_nothing(index_elements=["challenge_id", "user_id"])
+    ).rowcount
+    if not inserted:
+        db.rollback()
+        raise HTTPException(status_code=400, detail="User already joined this challenge")
 
+    participants = _participant_ids(db, challenge_id)
     db.commit()
-    db.refresh(challenge)
+    challenge_cache.invalidate(challenge_id)
+    _publish(challenge_id, "participant", action="joined", user_id=user_id,
+             participant_count=claimed.participant_count, group_progress=float(claimed.group_progress))
     return {"message": "Joined successfully", "participants": participants}
 
 
@@ -100,39 +220,152 @@ def join_challenge(challenge_id: int, user_id: int = Query(...), db: Session = D
 # ============================================================
 @router.delete("/{challenge_id}/leave")
 def leave_challenge(challenge_id: int, user_id: int = Query(...), db: Session = Depends(get_db)):
-    challenge = db.query(models.Challenge).filter(models.Challenge.id == challenge_id).first()
-    if not challenge:
+    # Lock the challenge row before touching the member row, in the same
+    # order as join and update_tasks, so concurrent writers cannot deadlock.
+    locked = db.scalar(
+        select(models.Challenge.id).where(models.Challenge.id == challenge_id).with_for_update()
+    )
+    if locked is None:
         raise HTTPException(status_code=404, detail="Challenge not found")
+    removed_progress = db.execute(
+        delete(models.ChallengeParticipant)
+        .where(
+            models.ChallengeParticipant.challenge_id == challenge_id,
+            models.ChallengeParticipant.user_id == user_id,
+        )
+        .returning(models.ChallengeParticipant.progress)
+        .execution_options(synchronize_session=False)
+    ).scalar_one_or_none()
+    if removed_progress is None:
+        db.rollback()
+        raise HTTPException(status_code=400, detail="User not in this challenge")
 
-    participants = challenge.participants or []
+    counts = db.execute(
+        update(models.Challenge)
+        .where(models.Challenge.id == challenge_id)
+        .values(
+            participant_count=models.Challenge.participant_count - 1,
+            progress_sum=models.Challenge.progress_sum - removed_progress,
+            group_progress=_group_average(
+                models.Challenge.participant_count - 1,
+                models.Challenge.progress_sum - removed_progress,
+            ),
+        )
+        .returning(models.Challenge.participant_count, models.Challenge.group_progress)
+        .execution_options(synchronize_session=False)
+    ).one()
+    # focus time only counts while a member; a later re-join starts from zero
+    db.execute(delete(models.FocusScore).where(
+        models.FocusScore.scope_id == challenge_id, models.FocusScore.user_id == user_id,
+    ))
+    participants = _participant_ids(db, challenge_id)
+    db.commit()
+    challenge_cache.invalidate(challenge_id)
+    leaderboards.remove(challenge_id, user_id)
+    _publish(challenge_id, "participant", action="left", user_id=user_id,
+             participant_count=counts.participant_count, group_progress=float(counts.group_progress))
+    return {"message": "Left challenge successfully", "participants": participants}
 
-    if user_id not in participants:
-        raise HTTPException(status_code=400, detail="User not in this challenge")
 
-    participants.remove(user_id)
-    challenge.participants = participants
+def _participant_ids(db: Session, challenge_id: int) -> list[int]:
+    return list(db.scalars(
+        select(models.ChallengeParticipant.user_id)
+        .where(models.ChallengeParticipant.challenge_id == challenge_id)
+        .order_by(models.ChallengeParticipant.joined_at)
+    ))
+
 
-    # Remove user progress entry
-    progress_map = challenge.progress or {}
-    progress_map.pop(str(user_id), None)
-    challenge.progress = progress_map
+def _group_average(count, total=models.Challenge.progress_sum):
+    """SQL for round(total / count, 2), or 0 for an empty challenge.
 
-    # Update group progress safely
-    progresses = list(progress_map.values())
-    challenge.group_progress = (
-        round(sum(progresses) / len(progresses), 2) if progresses else 0.0
+    Used inside UPDATE ... SET, where column references read the row's
+    pre-update values, so callers pass the post-update count/total.
+    """
+    return case(
+        (count > 0, func.round(cast(total / count, Numeric), 2)),
+        else_=0.0,
     )
 
-    db.commit()
-    db.refresh(challenge)
-    return {"message": "Left challenge successfully", "participants": participants}
+# ============================================================
+# 📡 Live updates (Server-Sent Events)
+# ============================================================
+def _topic(challenge_id: int) -> str:
+    return f"challenge:{challenge_id}"
+
+
+def _publish(challenge_id: int, event_type: str, **data):
+    """Push a delta to the challenge's stream subscribers; call after commit."""
+    get_broker().publish(_topic(challenge_id), {"type": event_type, "data": {"challenge_id": challenge_id, **data}})
+
+
+def _sse(event_type: str, data: dict) -> str:
+    return f"event: {event_type}\ndata: {json.dumps(data)}\n\n"
+
+
+async def _challenge_snapshot(challenge_id: int) -> dict | None:
+    async with AsyncSessionLocal() as db:
+        row = (await db.execute(
+            select(models.Challenge.participant_count, models.Challenge.group_progress)
+            .where(models.Challenge.id == challenge_id)
+        )).first()
+        if row is None:
+            return None
+        participants = (await db.scalars(
+            select(models.ChallengeParticipant.user_id)
+            .where(models.ChallengeParticipant.challenge_id == challenge_id)
+            .order_by(models.ChallengeParticipant.joined_at)
+        )).all()
+    return {
+        "challenge_id": challenge_id,
+        "participant_count": row.participant_count,
+        "group_progress": row.group_progress,
+        "participants": list(participants),
+    }
+
+
+@router.get("/{challenge_id}/stream")
+async def stream_challenge(challenge_id: int, request: Request):
+    """SSE stream: a `snapshot` event, then `progress`, `participant` and
+    `comment` deltas as they are committed. Idle streams get a comment
+    line every SSE_HEARTBEAT_SEC to keep proxies from closing them.
+
+    No DB session is held while streaming, only a queue subscription.
+    """
+    if await _challenge_snapshot(challenge_id) is None:
+        raise HTTPException(status_code=404, detail="Challenge not found")
+
+    async def events():
+        try:
+            async with get_broker().subscribe(_topic(challenge_id)) as sub:
+                # snapshot after subscribing so no delta falls in between
+                snapshot = await _challenge_snapshot(challenge_id)
+                if snapshot is None:
+                    return
+                yield _sse("snapshot", snapshot)
+                while True:
+                    event = await sub.get(timeout=SSE_HEARTBEAT_SEC)
+                    if event is None:
+                        if await request.is_disconnected():
+                            return
+                        yield ": ping\n\n"
+                        continue
+                    yield _sse(event["type"], event["data"])
+        except TooManySubscribers:
+            yield "retry: 30000\n" + _sse("error", {"detail": "Too many open streams, retry later"})
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
 
 # ============================================================
 # ✏️ Update Challenge
 # ============================================================
 @router.put("/{challenge_id}", response_model=schemas.ChallengeResponse)
 def update_challenge(challenge_id: int, challenge_data: schemas.ChallengeCreate, db: Session = Depends(get_db)):
-    challenge = db.query(models.Challenge).filter(models.Challenge.id == challenge_id).first()
+    # challenge row first, then its tasks: the lock order update_tasks uses
+    challenge = db.query(models.Challenge).filter(models.Challenge.id == challenge_id).with_for_update().first()
     if not challenge:
         raise HTTPException(status_code=404, detail="Challenge not found")
 
@@ -145,22 +378,27 @@ def update_challenge(challenge_id: int, challenge_data: schemas.ChallengeCreate,
 
     # ✅ Safely update tasks
     if challenge_data.tasks is not None:
-        challenge.tasks = challenge_data.tasks
+        challenge.tasks = [models.ChallengeTask(title=t) for t in challenge_data.tasks]
 
+    db.flush()
+    response = schemas.ChallengeResponse.model_validate(challenge, from_attributes=True)
     db.commit()
-    db.refresh(challenge)
-    return challenge
+    challenge_cache.invalidate(challenge_id)
+    return response
 
 # ============================================================
 # ❌ Delete Challenge
 # ============================================================
 @router.delete("/{challenge_id}")
 def delete_challenge(challenge_id: int, db: Session = Depends(get_db)):
-    challenge = db.query(models.Challenge).filter(models.Challenge.id == challenge_id).first()
+    challenge = db.query(models.Challenge).filter(models.Challenge.id == challenge_id).with_for_update().first()
     if not challenge:
         raise HTTPException(status_code=404, detail="Challenge not found")
     db.delete(challenge)
+    db.execute(delete(models.FocusScore).where(models.FocusScore.scope_id == challenge_id))
     db.commit()
+    challenge_cache.invalidate(challenge_id)
+    leaderboards.drop(challenge_id)
     return {"message": "Challenge deleted successfully"}
 
 
@@ -168,17 +406,37 @@ def delete_challenge(challenge_id: int, db: Session = Depends(get_db)):
 # 💬 Comments System (per challenge)
 # ============================================================
 
-from datetime import datetime
-
-# Temporary in-memory store (you can later move to a Comment model)
-COMMENTS = {}  # { challenge_id: [ {id, user_name, content, timestamp} ] }
-COMMENT_COUNTER = 1
+def _comment_out(comment: models.Comment) -> dict:
+    return {
+        "id": comment.id,
+        "user_id": comment.user_id,
+        "user_name": comment.user_name,
+        "content": comment.content,
+        "timestamp": comment.created_at.isoformat(),
+    }
 
 
-@router.get("/{challenge_id}/comments")
-def get_comments(challenge_id: int):
-    """Get all comments for a challenge"""
-    return COMMENTS.get(challenge_id, [])
+@router.get("/{challenge_id}/comments", response_class=ORJSONResponse)
+def get_comments(
+    challenge_id: int,
+    response: Response,
+    cursor: str | None = cursor_param(),
+    limit: int | None = limit_param(None),
+    db: Session = Depends(get_db),
+):
+    """Get comments for a challenge, oldest first (keyset on created_at, id)"""
+    limit = page_limit(limit, cursor)    # ChallengeDetails loads the whole thread unpaged
+    q = select(models.Comment).where(models.Comment.challenge_id == challenge_id)
+    if cursor:
+        after_created, after_id = decode_cursor(cursor, str, int)
+        after_created = parse_cursor_datetime(after_created)
+        q = q.where(or_(
+            models.Comment.created_at > after_created,
+            and_(models.Comment.created_at == after_created, models.Comment.id > after_id),
+        ))
+    q = q.order_by(models.Comment.created_at, models.Comment.id).limit(fetch_limit(limit))
+    comments = paginate(list(db.scalars(q)), limit, response, key=lambda c: (c.created_at, c.id))
+    return [_comment_out(c) for c in comments]
 
 
 @router.post("/{challenge_id}/comments")
@@ -186,49 +444,60 @@ def add_comment(
     challenge_id: int,
     user_id: int = Query(...),
     content: str = Query(...),
+    db: Session = Depends(get_db),
 ):
     """Add a new comment"""
-    global COMMENT_COUNTER
     if not content.strip():
         raise HTTPException(status_code=400, detail="Empty comment")
+    if db.get(models.Challenge, challenge_id) is None:
+        raise HTTPException(status_code=404, detail="Challenge not found")
 
-    comment = {
-        "id": COMMENT_COUNTER,
-        "user_id": user_id,
-        "user_name": f"User {user_id}",
-        "content": content.strip(),
-        "timestamp": datetime.utcnow().isoformat(),
-    }
-    COMMENT_COUNTER += 1
-
-    if challenge_id not in COMMENTS:
-        COMMENTS[challenge_id] = []
-    COMMENTS[challenge_id].append(comment)
-    return {"message": "Comment added successfully", "comment": comment}
+    comment = models.Comment(
+        challenge_id=challenge_id,
+        user_id=user_id,
+        user_name=f"User {user_id}",
+        content=content.strip(),
+        created_at=datetime.utcnow(),
+    )
+    db.add(comment)
+    db.flush()
+    out = _comment_out(comment)
+    db.commit()
+    _publish(challenge_id, "comment", action="added", comment=out)
+    return {"message": "Comment added successfully", "comment": out}
 
 
 @router.patch("/comments/{comment_id}")
-def update_comment(comment_id: int, content: str = Query(...)):
+def update_comment(comment_id: int, content: str = Query(...), db: Session = Depends(get_db)):
     """Update comment content"""
-    for challenge_id, items in COMMENTS.items():
-        for comment in items:
-            if comment["id"] == comment_id:
-                comment["content"] = content.strip()
-                return {"message": "Comment updated", "comment": comment}
-    raise HTTPException(status_code=404, detail="Comment not found")
+    comment = db.scalar(
+        update(models.Comment)
+        .where(models.Comment.id == comment_id)
+        .values(content=content.strip(), updated_at=datetime.utcnow())
+        .returning(models.Comment)
+    )
+    if comment is None:
+        raise HTTPException(status_code=404, detail="Comment not found")
+    out, challenge_id = _comment_out(comment), comment.challenge_id   # commit expires `comment`
+    db.commit()
+    _publish(challenge_id, "comment", action="updated", comment=out)
+    return {"message": "Comment updated", "comment": out}
 
 
 @router.delete("/comments/{comment_id}")
-def delete_comment(comment_id: int):
+def delete_comment(comment_id: int, db: Session = Depends(get_db)):
     """Delete a comment"""
-    for challenge_id, items in COMMENTS.items():
-        for comment in items:
-            if comment["id"] == comment_id:
-                COMMENTS[challenge_id] = [
-                    c for c in items if c["id"] != comment_id
-                ]
-                return {"message": "Comment deleted"}
-    raise HTTPException(status_code=404, detail="Comment not found")
+    challenge_id = db.scalar(
+        delete(models.Comment)
+        .where(models.Comment.id == comment_id)
+        .returning(models.Comment.challenge_id)
+        .execution_options(synchronize_session=False)
+    )
+    if challenge_id is None:
+        raise HTTPException(status_code=404, detail="Comment not found")
+    db.commit()
+    _publish(challenge_id, "comment", action="deleted", comment={"id": comment_id})
+    return {"message": "Comment deleted"}
 
 
 
@@ -245,17 +514,27 @@ def update_tasks(
     user_id: int = Query(...),
     db: Session = Depends(get_db),
 ):
-    challenge = (
-        db.query(models.Challenge)
-        .filter(models.Challenge.id == challenge_id)
-        .first()
+    # Lock the challenge row up front: toggles on one challenge serialize, so
+    # the shared task list and the running progress sum never lose an update.
+    locked = db.scalar(
+        select(models.Challenge.id).where(models.Challenge.id == challenge_id).with_for_update()
     )
-    if not challenge:
+    if locked is None:
         raise HTTPException(status_code=404, detail="Challenge not found")
+    previous = db.scalar(
+        select(models.ChallengeParticipant.progress).where(
+            models.ChallengeParticipant.challenge_id == challenge_id,
+            models.ChallengeParticipant.user_id == user_id,
+        )
+    )
+    if previous is None:
+        db.rollback()
+        raise HTTPException(status_code=400, detail="User not in this challenge")
+    challenge = db.get(models.Challenge, challenge_id)
 
     # convert Pydantic models to plain dicts for storage
     tasks_payload = [t.model_dump() for t in updated_tasks]
-    challenge.tasks = tasks_payload
+    challenge.tasks = [models.ChallengeTask(title=t["title"], done=t["done"]) for t in tasks_payload]
 
     # only valid tasks with non-empty title
     valid_tasks = [t for t in tasks_payload if t.get("title")]
@@ -267,16 +546,44 @@ def update_tasks(
         completed = len([t for t in valid_tasks if bool(t.get("done"))])
         user_progress = round((completed / total) * 100.0, 2)
 
-    progress_map = challenge.progress or {}
-    progress_map[str(user_id)] = user_progress
-    challenge.progress = progress_map
-
-    # recompute group progress (average of all users)
-    progresses = list(progress_map.values())
-    challenge.group_progress = (
-        round(sum(progresses) / len(progresses), 2) if progresses else 0.0
+    db.execute(
+        update(models.ChallengeParticipant)
+        .where(
+            models.ChallengeParticipant.challenge_id == challenge_id,
+            models.ChallengeParticipant.user_id == user_id,
+        )
+        .values(progress=user_progress)
+        .execution_options(synchronize_session=False)
     )
 
+    # group progress = running sum / member count, adjusted by this user's delta
+    delta = user_progress - previous
+    totals = db.execute(
+        update(models.Challenge)
+        .where(models.Challenge.id == challenge_id)
+        .values(
+            progress_sum=models.Challenge.progress_sum + delta,
+            group_progress=_group_average(
+                models.Challenge.participant_count,
+                models.Challenge.progress_sum + delta,
+            ),
+        )
+        .returning(models.Challenge.progress_sum, models.Challenge.group_progress)
+        .execution_options(synchronize_session=False)
+    ).one()
+    group_progress = float(totals.group_progress)
+
+    # mirror the Core updates onto the loaded objects and build the response
+    # before commit, instead of refreshing afterwards in a second transaction
+    db.flush()
+    set_committed_value(challenge, "progress_sum", totals.progress_sum)
+    set_committed_value(challenge, "group_progress", group_progress)
+    for member in challenge.members:
+        if member.user_id == user_id:
+            set_committed_value(member, "progress", user_progress)
+    response = schemas.ChallengeResponse.model_validate(challenge, from_attributes=True)
     db.commit()
-    db.refresh(challenge)
-    return challenge
\ No newline at end of file
+    challenge_cache.invalidate(challenge_id)
+    _publish(challenge_id, "progress", user_id=user_id, progress=user_progress,
+             group_progress=group_progress, tasks=tasks_payload)
+    return response
\ No newline at end of file
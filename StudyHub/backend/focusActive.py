@@ -0,0 +1,99 @@
+"""In-process index of running focus sessions, keyed by user.
+
+`/focus/status` answers from here without touching the database. The
+index is rebuilt from focus_sessions at startup and kept current by the
+start/resume/pause/complete handlers after they commit. It is per
+process, so it assumes one app worker (what the current deployment runs).
+"""
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Iterable
+
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+
+from .focusStats import ANONYMOUS_USER_ID
+from .models import FocusSession, SessionStatus
+
+
+@dataclass(frozen=True)
+class ActiveTimer:
+    session_id: int
+    duration_min: int
+    banked_sec: float        # elapsed before the current running stretch
+    resumed_at: datetime     # start of the current running stretch (UTC)
+
+    def elapsed(self, now: datetime | None = None) -> float:
+        now = now or datetime.utcnow()
+        return min(self.banked_sec + max(0.0, (now - self.resumed_at).total_seconds()), self.duration_min * 60)
+
+    def remaining(self, now: datetime | None = None) -> int:
+        return int(max(0, self.duration_min * 60 - self.elapsed(now)))
+
+
+def live_elapsed(sess: FocusSession, now: datetime | None = None) -> float:
+    """Elapsed seconds derived from timestamps; stored value unless running."""
+    banked = sess.elapsed_sec or 0.0
+    if sess.status != SessionStatus.running or sess.resumed_at is None:
+        return banked
+    now = now or datetime.utcnow()
+    return min(banked + max(0.0, (now - sess.resumed_at).total_seconds()), sess.duration_min * 60)
+
+
+class ActiveSessionIndex:
+    def __init__(self):
+        self._by_user: dict[int, dict[int, ActiveTimer]] = {}
+
+    @staticmethod
+    def _user(user_id: int | None) -> int:
+        return user_id if user_id is not None else ANONYMOUS_USER_ID
+
+    def track(self, sess: FocusSession):
+        """Record a session that just became running."""
+        timer = ActiveTimer(sess.id, sess.duration_min, sess.elapsed_sec or 0.0, sess.resumed_at or datetime.utcnow())
+        self._by_user.setdefault(self._user(sess.user_id), {})[sess.id] = timer
+
+    def drop(self, sess: FocusSession):
+        """Forget a session that stopped running (paused/completed)."""
+        user_id = self._user(sess.user_id)
+        timers = self._by_user.get(user_id)
+        if timers is not None:
+            timers.pop(sess.id, None)
+            if not timers:
+                del self._by_user[user_id]
+
+    def get(self, user_id: int | None) -> ActiveTimer | None:
+        """Most recently resumed running session of the user, if any."""
+        timers = self._by_user.get(self._user(user_id))
+        if not timers:
+            return None
+        return max(timers.values(), key=lambda t: t.resumed_at)
+
+    def reload(self, db: Session, user_ids: Iterable[int]) -> int:
+        """Re-read the running sessions of `user_ids` after a bulk change such as an import."""
+        user_ids = list(user_ids)
+        for user_id in user_ids:
+            self._by_user.pop(user_id, None)
+        running = db.scalars(select(FocusSession).where(
+            FocusSession.status == SessionStatus.running, FocusSession.user_id.in_(user_ids),
+        ))
+        count = 0
+        for sess in running:
+            self.track(sess)
+            count += 1
+        return count
+
+    def rebuild(self, db: Session) -> int:
+        self._by_user = {}
+        running = db.scalars(select(FocusSession).where(FocusSession.status == SessionStatus.running))
+        count = 0
+        for sess in running:
+            self.track(sess)
+            count += 1
+        return count
+
+    def __len__(self) -> int:
+        return sum(len(t) for t in self._by_user.values())
+
+
+active_sessions = ActiveSessionIndex()
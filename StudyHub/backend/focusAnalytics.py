@@ -0,0 +1,119 @@
+"""Historical focus analytics: per-period series and streaks.
+
+One GROUP BY returns a row per active day, for day series, totals and
+streaks. Week/month series are grouped by the bucket expression in SQL
+(a second GROUP BY) and zero-filled in memory. No query runs per day or
+per bucket.
+"""
+from datetime import date, datetime, time, timedelta
+
+from sqlalchemy import Date, case, cast, func, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from .models import FocusSession, SessionStatus
+
+GRANULARITIES = ("day", "week", "month")
+MAX_RANGE_DAYS = 731
+
+
+def bucket_start(day: date, granularity: str) -> date:
+    if granularity == "week":
+        return day - timedelta(days=day.weekday())    # ISO week, Monday start (= date_trunc('week'))
+    if granularity == "month":
+        return day.replace(day=1)
+    return day
+
+
+def _next_bucket(start: date, granularity: str) -> date:
+    if granularity == "week":
+        return start + timedelta(days=7)
+    if granularity == "month":
+        return (start.replace(day=28) + timedelta(days=4)).replace(day=1)
+    return start + timedelta(days=1)
+
+
+def _bucket_expr(granularity: str, dialect: str):
+    started = FocusSession.started_at
+    if granularity == "day":
+        return func.date(started)
+    if dialect == "postgresql":
+        return cast(func.date_trunc(granularity, started), Date)
+    if granularity == "week":
+        return func.date(started, "-6 days", "weekday 1")    # back to Monday
+    return func.date(started, "start of month")
+
+
+async def bucket_rows(
+    db: AsyncSession, user_id: int | None, day_from: date, day_to: date, granularity: str = "day",
+) -> dict[date, tuple]:
+    """{bucket start: (sessions, completed, elapsed_sec, growth_sum)} for buckets with sessions."""
+    completed = FocusSession.status == SessionStatus.completed
+    bucket = _bucket_expr(granularity, db.bind.dialect.name).label("bucket")
+    q = select(
+        bucket,
+        func.count(FocusSession.id),
+        func.sum(case((completed, 1), else_=0)),
+        func.coalesce(func.sum(FocusSession.elapsed_sec), 0.0),
+        func.sum(case((completed, FocusSession.plant_growth), else_=0.0)),
+    ).where(
+        FocusSession.started_at >= datetime.combine(day_from, time.min),
+        FocusSession.started_at < datetime.combine(day_to + timedelta(days=1), time.min),
+    )
+    if user_id is not None:
+        q = q.where(FocusSession.user_id == user_id)
+    rows = (await db.execute(q.group_by(bucket))).all()
+    # SQLite's date() yields 'YYYY-MM-DD' text, Postgres a date
+    return {
+        (d if isinstance(d, date) else date.fromisoformat(d)): (n, done or 0, float(elapsed or 0), float(growth or 0))
+        for d, n, done, elapsed, growth in rows
+    }
+
+
+async def daily_rows(db: AsyncSession, user_id: int | None, day_from: date, day_to: date) -> dict[date, tuple]:
+    """{day: (sessions, completed, elapsed_sec, growth_sum)} for days with sessions."""
+    return await bucket_rows(db, user_id, day_from, day_to, "day")
+
+
+def period_stats(start: date, sessions: int, completed: int, elapsed: float, growth: float) -> dict:
+    return {
+        "period": start.isoformat(),
+        "sessions": sessions,
+        "completed": completed,
+        "total_elapsed_sec": round(elapsed, 3),
+        "completion_rate": round(completed / sessions, 4) if sessions else 0.0,
+        "avg_plant_growth": round(growth / completed, 4) if completed else 0.0,
+    }
+
+
+def rollup(buckets: dict[date, tuple], day_from: date, day_to: date, granularity: str) -> list[dict]:
+    """Zero-filled series of `bucket_rows` buckets covering [day_from, day_to]."""
+    series = []
+    start = bucket_start(day_from, granularity)
+    while start <= day_to:
+        series.append(period_stats(start, *buckets.get(start, (0, 0, 0.0, 0.0))))
+        start = _next_bucket(start, granularity)
+    return series
+
+
+def streaks(days: dict[date, tuple], day_to: date) -> tuple[int, int]:
+    """(current, longest) runs of consecutive days with a completed session.
+
+    The current streak ends on day_to, or on the day before if day_to has
+    no completed session yet (the day is not over). Both are measured
+    inside the requested range.
+    """
+    active = sorted(day for day, (_, completed, _, _) in days.items() if completed)
+    longest = run = 0
+    previous = None
+    for day in active:
+        run = run + 1 if previous is not None and day - previous == timedelta(days=1) else 1
+        longest = max(longest, run)
+        previous = day
+
+    active_set = set(active)
+    cursor = day_to if day_to in active_set else day_to - timedelta(days=1)
+    current = 0
+    while cursor in active_set:
+        current += 1
+        cursor -= timedelta(days=1)
+    return current, longest
@@ -0,0 +1,113 @@
+"""Maintenance of the focus_daily_stats rollup.
+
+    python -m backend.focusStats rebuild [--from YYYY-MM-DD] [--to YYYY-MM-DD]
+"""
+import argparse
+from datetime import date, datetime, time, timedelta
+from typing import Iterable
+
+from sqlalchemy import case, delete, func, insert, select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+
+from .database import dialect_insert
+from .models import FocusDailyStats, FocusSession, SessionStatus
+
+ANONYMOUS_USER_ID = 0
+
+
+def stats_key(sess: FocusSession) -> tuple[int, date]:
+    return (sess.user_id if sess.user_id is not None else ANONYMOUS_USER_ID, sess.started_at.date())
+
+
+async def bump_daily_stats(
+    db: AsyncSession,
+    sess: FocusSession,
+    elapsed_delta: float,
+    completed_delta: int = 0,
+    growth_delta: float = 0.0,
+):
+    """Add deltas to the session's (user, day) row inside the caller's transaction."""
+    user_id, day = stats_key(sess)
+    stmt = dialect_insert(db.bind.dialect.name)(FocusDailyStats).values(
+        user_id=user_id,
+        day=day,
+        total_elapsed_sec=elapsed_delta,
+        completed_count=completed_delta,
+        growth_sum=growth_delta,
+    )
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[FocusDailyStats.user_id, FocusDailyStats.day],
+        set_={
+            "total_elapsed_sec": FocusDailyStats.total_elapsed_sec + stmt.excluded.total_elapsed_sec,
+            "completed_count": FocusDailyStats.completed_count + stmt.excluded.completed_count,
+            "growth_sum": FocusDailyStats.growth_sum + stmt.excluded.growth_sum,
+        },
+    )
+    await db.execute(stmt)
+
+
+def rebuild_daily_stats(
+    db: Session,
+    day_from: date | None = None,
+    day_to: date | None = None,
+    commit: bool = True,
+    user_ids: Iterable[int] | None = None,
+) -> int:
+    """Recompute rollup rows for [day_from, day_to] from focus_sessions in one statement.
+
+    commit=False leaves the caller's transaction open (e.g. a bulk import);
+    user_ids limits the rebuild to those users' rows.
+    """
+    wipe = delete(FocusDailyStats)
+    sessions = select(
+        func.coalesce(FocusSession.user_id, ANONYMOUS_USER_ID),
+        func.date(FocusSession.started_at),
+        func.sum(FocusSession.elapsed_sec),
+        func.sum(case((FocusSession.status == SessionStatus.completed, 1), else_=0)),
+        func.sum(case((FocusSession.status == SessionStatus.completed, FocusSession.plant_growth), else_=0.0)),
+    ).where(FocusSession.started_at.is_not(None))
+    if day_from is not None:
+        wipe = wipe.where(FocusDailyStats.day >= day_from)
+        sessions = sessions.where(FocusSession.started_at >= datetime.combine(day_from, time.min))
+    if day_to is not None:
+        wipe = wipe.where(FocusDailyStats.day <= day_to)
+        sessions = sessions.where(FocusSession.started_at < datetime.combine(day_to + timedelta(days=1), time.min))
+    if user_ids is not None:
+        user_ids = list(user_ids)
+        wipe = wipe.where(FocusDailyStats.user_id.in_(user_ids))
+        sessions = sessions.where(FocusSession.user_id.in_(user_ids))
+    sessions = sessions.group_by(
+        func.coalesce(FocusSession.user_id, ANONYMOUS_USER_ID), func.date(FocusSession.started_at)
+    )
+
+    db.execute(wipe)
+    result = db.execute(
+        insert(FocusDailyStats).from_select(
+            ["user_id", "day", "total_elapsed_sec", "completed_count", "growth_sum"], sessions
+        )
+    )
+    if commit:
+        db.commit()
+    return result.rowcount
+
+
+def main():
+    from .database import SessionLocal, engine
+    from .migrations import upgrade
+
+    parser = argparse.ArgumentParser(description="Focus rollup maintenance")
+    sub = parser.add_subparsers(dest="command", required=True)
+    rebuild = sub.add_parser("rebuild", help="recompute focus_daily_stats from focus_sessions")
+    rebuild.add_argument("--from", dest="day_from", type=date.fromisoformat)
+    rebuild.add_argument("--to", dest="day_to", type=date.fromisoformat)
+    args = parser.parse_args()
+
+    upgrade(engine)
+    with SessionLocal() as db:
+        rows = rebuild_daily_stats(db, args.day_from, args.day_to)
+    print(f"Rebuilt {rows} focus_daily_stats rows")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,41 +1,109 @@
-from datetime import datetime, date
-from fastapi import APIRouter, Depends, HTTPException, Query
-from sqlalchemy.orm import Session
+from datetime import datetime, date, timedelta
+from fastapi import APIRouter, Depends, HTTPException, Query, Response
+from sqlalchemy import DateTime, Float, and_, case, cast, false, func, literal, not_, or_, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
 
-from .database import get_db
-from .models  import FocusSession, SessionStatus
-from .schemas import FocusCreate, FocusResponse, FocusTick, FocusSummary
+from .database import get_async_db
+from .focusActive import active_sessions, live_elapsed
+from .focusAnalytics import GRANULARITIES, MAX_RANGE_DAYS, bucket_rows, daily_rows, period_stats, rollup, streaks
+from .focusStats import bump_daily_stats
+from .leaderboard import GLOBAL_SCOPE, add_focus_time, apply as apply_scores, leaderboards
+from .models  import FocusDailyStats, FocusSession, SessionStatus, User
+from .pagination import cursor_param, decode_cursor, limit_param, paginate, parse_cursor_datetime
+from .schemas import (
+    FocusAnalytics, FocusCreate, FocusPeriod, FocusResponse, FocusTick, FocusSummary, LeaderboardEntry, LeaderboardRank,
+)
+from .serialization import RowSerializer, fast_json
+from .tokens import check_token_user, token_user_id
 
 router = APIRouter(prefix="/focus", tags=["Focus Timer"])
 
+_session_rows = RowSerializer(FocusResponse, FocusSession.__table__)
+
 # ---------- helpers ----------
-def _cap(v: float, lo: float, hi: float) -> float:
-    return min(max(v, lo), hi)
+# Transitions run as one guarded UPDATE ... RETURNING, so the new elapsed
+# time and growth are computed in SQL from the row as it is being updated
+# (SET expressions see the pre-update values).
+
+def _cap(v, lo, hi, dialect: str):
+    if dialect == "postgresql":
+        return func.least(func.greatest(v, lo), hi)
+    return func.min(func.max(v, lo), hi)     # SQLite's scalar min()/max()
+
+def _seconds_since(col, now: datetime, dialect: str):
+    now = literal(now, DateTime())
+    if dialect == "postgresql":
+        return cast(func.extract("epoch", now - col), Float)
+    return (func.julianday(now) - func.julianday(col)) * 86400.0
+
+def _settled_elapsed(tick: FocusTick | None, now: datetime, dialect: str):
+    """Elapsed seconds when a session stops running, derived from resumed_at.
+
+    The client's tick only fills in for legacy running sessions that have
+    no resumed_at; paused sessions already hold their banked time.
+    """
+    banked = func.coalesce(FocusSession.elapsed_sec, 0.0)
+    running = FocusSession.status == SessionStatus.running
+    legacy = banked if tick is None or tick.elapsed_sec is None else literal(tick.elapsed_sec, Float())
+    full = FocusSession.duration_min * 60.0
+    stretch = _cap(_seconds_since(FocusSession.resumed_at, now, dialect), 0.0, full, dialect)
+    elapsed = case(
+        (and_(running, FocusSession.resumed_at.is_not(None)), banked + stretch),
+        (running, legacy),
+        else_=banked,
+    )
+    return _cap(elapsed, 0.0, full, dialect)
 
-def _compute_growth(duration_min: int, elapsed_sec: float, did_pause: bool, status: SessionStatus) -> float:
+def _growth(elapsed):
     """
-    plant growth logic (4 levels):
+    plant growth logic (4 levels), for a session being completed:
     - 0.0: Incomplete / abandoned session
     - 0.33: Session completed but with multiple pauses/breaks
     - 0.66: Session completed with 1 short pause
     - 1.0: Session completed fully with no pauses
     """
-    if status != SessionStatus.completed:
-        return 0.0
-
-    full_required = duration_min * 60
-    if elapsed_sec + 0.5 < full_required * 0.7:
-        return 0.0  
-
-    if not did_pause:
-        return 1.0
-    elif did_pause and elapsed_sec >= full_required * 0.9:
-        return 0.66
-    elif did_pause and elapsed_sec >= full_required * 0.6:
-        return 0.33
-    else:
-        return 0.0
+    full_required = FocusSession.duration_min * 60.0
+    return case(
+        (elapsed + 0.5 < full_required * 0.7, 0.0),
+        (not_(func.coalesce(FocusSession.did_pause, false())), 1.0),
+        (elapsed >= full_required * 0.9, 0.66),
+        (elapsed >= full_required * 0.6, 0.33),
+        else_=0.0,
+    )
+
+async def _transition(db: AsyncSession, sid: int, allowed: tuple, error: str, **values) -> tuple[FocusSession, float]:
+    """UPDATE the session if its status is in `allowed`, in one statement.
 
+    Returns the updated row and its elapsed_sec from before the update.
+    No matching row means 404 if the session is missing, 409 otherwise.
+    """
+    stmt = update(FocusSession).values(**values).execution_options(synchronize_session=False)
+    if db.bind.dialect.name == "postgresql":
+        # RETURNING only sees the new row; the pre-update value comes from a
+        # locked FROM subquery, still in the same statement
+        old = (
+            select(FocusSession.id, FocusSession.elapsed_sec)
+            .where(FocusSession.id == sid)
+            .with_for_update()
+            .subquery("old")
+        )
+        stmt = stmt.where(FocusSession.id == old.c.id, FocusSession.status.in_(allowed))
+        row = (await db.execute(stmt.returning(FocusSession, old.c.elapsed_sec))).first()
+    else:
+        # SQLite's RETURNING cannot see FROM tables. BEGIN IMMEDIATE already
+        # holds the write lock, so reading first cannot race (and is local).
+        previous = await db.scalar(select(FocusSession.elapsed_sec).where(FocusSession.id == sid))
+        stmt = stmt.where(FocusSession.id == sid, FocusSession.status.in_(allowed))
+        sess = await db.scalar(stmt.returning(FocusSession))
+        row = (sess, previous) if sess is not None else None
+    if row is None:
+        await db.rollback()
+        status = await db.scalar(select(FocusSession.status).where(FocusSession.id == sid))
+        if status is None:
+            raise HTTPException(404, "Session not found")
+        raise HTTPException(409, error.format(status=status))
+    sess, previous = row
+    return sess, previous or 0.0
 
 def _today_bounds():
     now = datetime.utcnow()
@@ -45,76 +113,116 @@ def _today_bounds():
 
 # ---------- endpoints ----------
 @router.post("/sessions", response_model=FocusResponse)
-def create_session(payload: FocusCreate, db: Session = Depends(get_db)):
+async def create_session(payload: FocusCreate, db: AsyncSession = Depends(get_async_db)):
     sess = FocusSession(title=payload.title, duration_min=payload.duration_min, user_id=payload.user_id)
     db.add(sess)
-    db.commit()
-    db.refresh(sess)
+    await db.flush()    # all columns have Python-side defaults, so no refresh is needed
+    await db.commit()
     return sess
 
 @router.post("/sessions/{sid}/start", response_model=FocusResponse)
-def start_session(sid: int, db: Session = Depends(get_db)):
-    sess = db.get(FocusSession, sid)
-    if not sess:
-        raise HTTPException(404, "Session not found")
-    if sess.status not in (SessionStatus.created, SessionStatus.paused):
-        raise HTTPException(409, f"Cannot start from status {sess.status}")
-    if sess.status == SessionStatus.created:
-        sess.started_at = datetime.utcnow()
-    sess.status = SessionStatus.running
-    db.commit(); db.refresh(sess)
+async def start_session(sid: int, db: AsyncSession = Depends(get_async_db)):
+    now = datetime.utcnow()
+    sess, _ = await _transition(
+        db, sid, (SessionStatus.created, SessionStatus.paused), "Cannot start from status {status}",
+        started_at=case((FocusSession.status == SessionStatus.created, now), else_=FocusSession.started_at),
+        resumed_at=now,
+        status=SessionStatus.running,
+    )
+    await db.commit()
+    active_sessions.track(sess)
     return sess
 
 @router.post("/sessions/{sid}/pause", response_model=FocusResponse)
-def pause_session(sid: int, tick: FocusTick, db: Session = Depends(get_db)):
-    sess = db.get(FocusSession, sid)
-    if not sess: raise HTTPException(404, "Session not found")
-    if sess.status != SessionStatus.running:
-        raise HTTPException(409, "Only running sessions can be paused")
-    max_sec = sess.duration_min * 60
-    sess.elapsed_sec = _cap(tick.elapsed_sec, 0, max_sec)
-    sess.pauses_count += 1
-    sess.did_pause = True
-    sess.status = SessionStatus.paused
-    db.commit(); db.refresh(sess)
+async def pause_session(sid: int, tick: FocusTick | None = None, db: AsyncSession = Depends(get_async_db)):
+    sess, previous = await _transition(
+        db, sid, (SessionStatus.running,), "Only running sessions can be paused",
+        elapsed_sec=_settled_elapsed(tick, datetime.utcnow(), db.bind.dialect.name),
+        resumed_at=None,
+        pauses_count=func.coalesce(FocusSession.pauses_count, 0) + 1,
+        did_pause=True,
+        status=SessionStatus.paused,
+    )
+    await bump_daily_stats(db, sess, sess.elapsed_sec - previous)
+    await db.commit()
+    active_sessions.drop(sess)
     return sess
 
 @router.post("/sessions/{sid}/resume", response_model=FocusResponse)
-def resume_session(sid: int, db: Session = Depends(get_db)):
-    sess = db.get(FocusSession, sid)
-    if not sess: raise HTTPException(404, "Session not found")
-    if sess.status != SessionStatus.paused:
-        raise HTTPException(409, "Only paused sessions can be resumed")
-    sess.status = SessionStatus.running
-    db.commit(); db.refresh(sess)
+async def resume_session(sid: int, db: AsyncSession = Depends(get_async_db)):
+    sess, _ = await _transition(
+        db, sid, (SessionStatus.paused,), "Only paused sessions can be resumed",
+        resumed_at=datetime.utcnow(),
+        status=SessionStatus.running,
+    )
+    await db.commit()
+    active_sessions.track(sess)
     return sess
 
 @router.post("/sessions/{sid}/complete", response_model=FocusResponse)
-def complete_session(sid: int, tick: FocusTick, db: Session = Depends(get_db)):
-    sess = db.get(FocusSession, sid)
-    if not sess: raise HTTPException(404, "Session not found")
-    if sess.status not in (SessionStatus.running, SessionStatus.paused):
-        raise HTTPException(409, "Only running/paused sessions can be completed")
-    max_sec = sess.duration_min * 60
-    sess.elapsed_sec = _cap(tick.elapsed_sec, 0, max_sec)
-    sess.status = SessionStatus.completed
-    sess.completed_at = datetime.utcnow()
-    sess.plant_growth = _compute_growth(sess.duration_min, sess.elapsed_sec, sess.did_pause, sess.status)
-    db.commit(); db.refresh(sess)
+async def complete_session(sid: int, tick: FocusTick | None = None, db: AsyncSession = Depends(get_async_db)):
+    now = datetime.utcnow()
+    elapsed = _settled_elapsed(tick, now, db.bind.dialect.name)
+    sess, previous = await _transition(
+        db, sid, (SessionStatus.running, SessionStatus.paused), "Only running/paused sessions can be completed",
+        elapsed_sec=elapsed,
+        resumed_at=None,
+        status=SessionStatus.completed,
+        completed_at=now,
+        plant_growth=_growth(elapsed),
+    )
+    await bump_daily_stats(db, sess, sess.elapsed_sec - previous, completed_delta=1, growth_delta=sess.plant_growth)
+    scores = await add_focus_time(db, sess.user_id, sess.elapsed_sec) if sess.user_id is not None else []
+    await db.commit()
+    active_sessions.drop(sess)
+    apply_scores(sess.user_id, scores)
     return sess
 
 @router.get("/sessions", response_model=list[FocusResponse])
-def list_sessions(user_id: int | None = None, db: Session = Depends(get_db)):
-    q = db.query(FocusSession)
+async def list_sessions(
+    response: Response,
+    user_id: int | None = None,
+    status: SessionStatus | None = None,
+    started_from: datetime | None = Query(None, description="Only sessions started at/after this time (UTC)"),
+    started_to: datetime | None = Query(None, description="Only sessions started before this time (UTC)"),
+    cursor: str | None = cursor_param(),
+    limit: int = limit_param(),
+    db: AsyncSession = Depends(get_async_db),
+):
+    """Newest first, keyset-paginated on (started_at, id); unstarted sessions come last."""
+    fast = fast_json("list_sessions")
+    q = select(*_session_rows.columns) if fast else select(FocusSession)
     if user_id is not None:
-        q = q.filter(FocusSession.user_id == user_id)
-    return q.order_by(FocusSession.started_at.desc().nullslast(), FocusSession.id.desc()).all()
+        q = q.where(FocusSession.user_id == user_id)
+    if status is not None:
+        q = q.where(FocusSession.status == status)
+    if started_from is not None:
+        q = q.where(FocusSession.started_at >= started_from)
+    if started_to is not None:
+        q = q.where(FocusSession.started_at < started_to)
+    if cursor:
+        after_started, after_id = decode_cursor(cursor, (str, type(None)), int)
+        after_started = parse_cursor_datetime(after_started)
+        if after_started is None:
+            q = q.where(FocusSession.started_at.is_(None), FocusSession.id < after_id)
+        else:
+            q = q.where(or_(
+                FocusSession.started_at < after_started,
+                and_(FocusSession.started_at == after_started, FocusSession.id < after_id),
+                FocusSession.started_at.is_(None),
+            ))
+    q = q.order_by(FocusSession.started_at.desc().nullslast(), FocusSession.id.desc()).limit(limit + 1)
+    if fast:
+        rows = paginate((await db.execute(q)).all(), limit, response, key=lambda s: (s.started_at, s.id))
+        return _session_rows.response(rows, response)
+    rows = (await db.scalars(q)).all()
+    return paginate(rows, limit, response, key=lambda s: (s.started_at, s.id))
 
 @router.get("/summary", response_model=FocusSummary)
-def daily_summary(
+async def daily_summary(
     user_id: int | None = None,
     day: str | None = Query(None, description="YYYY-MM-DD (UTC). Defaults to today."),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     if day:
         y, m, d = map(int, day.split("-"))
@@ -123,34 +231,28 @@ def daily_summary(
     else:
         start, end = _today_bounds()
 
-    q = db.query(FocusSession).filter(FocusSession.started_at >= start, FocusSession.started_at <= end)
+    # totals come from the rollup: one row per user, so a PK lookup when user_id is given
+    totals = select(
+        func.coalesce(func.sum(FocusDailyStats.total_elapsed_sec), 0.0),
+        func.coalesce(func.sum(FocusDailyStats.completed_count), 0),
+        func.coalesce(func.sum(FocusDailyStats.growth_sum), 0.0),
+    ).where(FocusDailyStats.day == start.date())
     if user_id is not None:
-        q = q.filter(FocusSession.user_id == user_id)
-    sessions = q.all()
-    
-    if not sessions:
-        return FocusSummary(
-            date=(day or date.today().isoformat()),
-            total_elapsed_sec=0,
-            active_timer=None,
-            daily_plant_growth=0.0
-        )
-
-    total_elapsed = sum(s.elapsed_sec for s in sessions)
-
-    completed_sessions = [s for s in sessions if s.status == SessionStatus.completed]
-    if completed_sessions:
-        daily_growth = sum(s.plant_growth for s in completed_sessions) / len(completed_sessions)
-    else:
-        daily_growth = 0.0
-
+        totals = totals.where(FocusDailyStats.user_id == user_id)
+    total_elapsed, completed_count, growth_sum = (await db.execute(totals)).one()
+    daily_growth = growth_sum / completed_count if completed_count else 0.0
 
     # active timer (remaining) from most recent running session
-    running = [s for s in sessions if s.status == SessionStatus.running]
+    running = select(FocusSession).where(
+        FocusSession.status == SessionStatus.running,
+        FocusSession.started_at >= start, FocusSession.started_at <= end,
+    )
+    if user_id is not None:
+        running = running.where(FocusSession.user_id == user_id)
+    latest = await db.scalar(running.order_by(FocusSession.updated_at.desc()).limit(1))
     active_remaining = None
-    if running:
-        latest = sorted(running, key=lambda s: s.updated_at or s.started_at or datetime.min)[-1]
-        active_remaining = int(max(0, latest.duration_min*60 - latest.elapsed_sec))
+    if latest:
+        active_remaining = int(max(0, latest.duration_min*60 - live_elapsed(latest)))
 
     return FocusSummary(
         date=(day or date.today().isoformat()),
@@ -159,13 +261,84 @@ def daily_summary(
         daily_plant_growth=daily_growth
     )
 
-@router.get("/status")
-def get_focus_status(db: Session = Depends(get_db)):
+@router.get("/analytics", response_model=FocusAnalytics)
+async def focus_analytics(
+    user_id: int | None = None,
+    date_from: date | None = Query(None, description="YYYY-MM-DD (UTC), inclusive. Defaults to 29 days before date_to."),
+    date_to: date | None = Query(None, description="YYYY-MM-DD (UTC), inclusive. Defaults to today."),
+    granularity: str = Query("day", pattern="^(" + "|".join(GRANULARITIES) + ")$"),
+    db: AsyncSession = Depends(get_async_db),
+):
+    """Per-day/week/month totals, completion rate, average growth and streaks; one GROUP BY per granularity."""
+    date_to = date_to or date.today()
+    date_from = date_from or date_to - timedelta(days=29)
+    if date_from > date_to:
+        raise HTTPException(400, "date_from must be on or before date_to")
+    if (date_to - date_from).days >= MAX_RANGE_DAYS:
+        raise HTTPException(400, f"Range is limited to {MAX_RANGE_DAYS} days")
+
+    days = await daily_rows(db, user_id, date_from, date_to)
+    buckets = days if granularity == "day" else await bucket_rows(db, user_id, date_from, date_to, granularity)
+    sums = [sum(values[i] for values in days.values()) for i in range(4)]
+    current, longest = streaks(days, date_to)
+    return FocusAnalytics(
+        granularity=granularity,
+        date_from=date_from.isoformat(),
+        date_to=date_to.isoformat(),
+        series=rollup(buckets, date_from, date_to, granularity),
+        totals=FocusPeriod(**period_stats(date_from, *sums)),
+        current_streak=current,
+        longest_streak=longest,
+    )
+
+@router.get("/leaderboard", response_model=list[LeaderboardEntry])
+async def get_leaderboard(
+    challenge_id: int | None = Query(None, description="Challenge board; the global board if omitted"),
+    limit: int = Query(10, ge=1, le=100),
+    db: AsyncSession = Depends(get_async_db),
+):
+    """Top `limit` users by completed focus time, from the in-memory board."""
+    board = leaderboards.board(challenge_id if challenge_id is not None else GLOBAL_SCOPE)
+    while True:
+        top = board.top(limit) if board is not None else []
+        if not top:
+            return []
+        names = dict((await db.execute(
+            select(User.id, User.name).where(User.id.in_([user_id for _, user_id, _ in top]))
+        )).all())
+        gone = [user_id for _, user_id, _ in top if user_id not in names]
+        if not gone:
+            break
+        for user_id in gone:    # deleted since the boards were loaded
+            leaderboards.forget(user_id)
+    return [
+        LeaderboardEntry(rank=rank, user_id=user_id, name=names[user_id], total_sec=round(total, 3))
+        for rank, user_id, total in top
+    ]
 
-    active = db.query(FocusSession).filter(FocusSession.status == SessionStatus.running).first()
+@router.get("/leaderboard/rank", response_model=LeaderboardRank)
+async def get_leaderboard_rank(user_id: int, challenge_id: int | None = None):
+    """Rank of `user_id` on the global or a challenge board, in O(log n)."""
+    board = leaderboards.board(challenge_id if challenge_id is not None else GLOBAL_SCOPE)
+    found = board.rank(user_id) if board is not None else None
+    return LeaderboardRank(
+        user_id=user_id,
+        challenge_id=challenge_id,
+        rank=found[0] if found else None,
+        total_sec=round(found[1], 3) if found else 0.0,
+        board_size=len(board) if board is not None else 0,
+    )
+
+@router.get("/status")
+async def get_focus_status(user_id: int | None = None, token_user: int | None = Depends(token_user_id)):
+    """Running timer of `user_id` (or the token's user), from the in-process index."""
+    if user_id is not None:
+        check_token_user(token_user, user_id)
+    else:
+        user_id = token_user
+    active = active_sessions.get(user_id) if user_id is not None else None
     if active:
-        remaining = int(max(0, active.duration_min * 60 - active.elapsed_sec))
-        return {"active": True, "remaining": remaining}
+        return {"active": True, "remaining": active.remaining(), "session_id": active.session_id}
     return {"active": False}
 
 
@@ -0,0 +1,220 @@
+"""Focus-time leaderboards: global and per challenge.
+
+focus_scores holds the authoritative totals; each scope is mirrored in
+memory as a SortedList, so a score update is O(log n) and top-K / rank
+lookups never touch focus_sessions. The boards are rebuilt from
+focus_scores at startup. Like the active-session index they are per
+process, which matches the single-worker deployment.
+
+Users are deleted outside the app. Startup loads focus_scores as is (no
+writes on the cold-start path); board entries of a deleted user are
+pruned the first time a top-K read misses the user. The CLI removes
+their rows: `recompute_scores` never writes them, and `prune` only
+deletes them.
+
+    python -m backend.leaderboard rebuild   # recompute focus_scores from focus_sessions
+    python -m backend.leaderboard prune     # delete focus_scores rows of deleted users
+"""
+import argparse
+from typing import Iterable
+
+from sortedcontainers import SortedList
+from sqlalchemy import delete, func, insert, select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+
+from .database import dialect_insert
+from .models import ChallengeParticipant, FocusScore, FocusSession, SessionStatus, User
+
+GLOBAL_SCOPE = 0
+
+
+class Board:
+    """Scores of one scope, ordered by (-score, user_id)."""
+
+    def __init__(self):
+        self._scores: dict[int, float] = {}
+        self._order = SortedList()
+
+    def set(self, user_id: int, score: float):
+        old = self._scores.get(user_id)
+        if old is not None:
+            self._order.remove((-old, user_id))
+        self._scores[user_id] = score
+        self._order.add((-score, user_id))
+
+    def raise_to(self, user_id: int, score: float):
+        """set() that never lowers a score: totals committed out of order keep the larger one."""
+        if self._scores.get(user_id, float("-inf")) < score:
+            self.set(user_id, score)
+
+    def remove(self, user_id: int):
+        old = self._scores.pop(user_id, None)
+        if old is not None:
+            self._order.remove((-old, user_id))
+
+    def top(self, k: int) -> list[tuple[int, int, float]]:
+        """[(rank, user_id, score)]; tied scores share a rank."""
+        rows, rank, previous = [], 0, None
+        for i, (neg, user_id) in enumerate(self._order.islice(0, k)):
+            if neg != previous:
+                rank, previous = i + 1, neg
+            rows.append((rank, user_id, -neg))
+        return rows
+
+    def rank(self, user_id: int) -> tuple[int, float] | None:
+        """(rank, score): 1 + number of users with a strictly higher score."""
+        score = self._scores.get(user_id)
+        if score is None:
+            return None
+        return self._order.bisect_left((-score,)) + 1, score
+
+    def __len__(self) -> int:
+        return len(self._scores)
+
+
+class Leaderboards:
+    def __init__(self):
+        self._boards: dict[int, Board] = {}
+
+    def board(self, scope_id: int) -> Board | None:
+        return self._boards.get(scope_id)
+
+    def set(self, scope_id: int, user_id: int, score: float):
+        self._boards.setdefault(scope_id, Board()).set(user_id, score)
+
+    def raise_to(self, scope_id: int, user_id: int, score: float):
+        self._boards.setdefault(scope_id, Board()).raise_to(user_id, score)
+
+    def remove(self, scope_id: int, user_id: int):
+        board = self._boards.get(scope_id)
+        if board is not None:
+            board.remove(user_id)
+
+    def forget(self, user_id: int):
+        """Drop a deleted user from every board."""
+        for board in self._boards.values():
+            board.remove(user_id)
+
+    def drop(self, scope_id: int):
+        self._boards.pop(scope_id, None)
+
+    def reload(self, db: Session, user_ids: Iterable[int]) -> int:
+        """Re-read the scores of `user_ids` after a bulk change such as an import."""
+        user_ids = list(user_ids)
+        for user_id in user_ids:
+            self.forget(user_id)
+        rows = db.execute(
+            select(FocusScore.scope_id, FocusScore.user_id, FocusScore.total_sec)
+            .where(FocusScore.user_id.in_(user_ids))
+        )
+        count = 0
+        for scope_id, user_id, total in rows:
+            self.set(scope_id, user_id, total)
+            count += 1
+        return count
+
+    def rebuild(self, db: Session) -> int:
+        boards: dict[int, Board] = {}
+        rows = db.execute(select(FocusScore.scope_id, FocusScore.user_id, FocusScore.total_sec))
+        count = 0
+        for scope_id, user_id, total in rows:
+            boards.setdefault(scope_id, Board()).set(user_id, total)
+            count += 1
+        self._boards = boards
+        return count
+
+
+leaderboards = Leaderboards()
+
+
+# ============================================================
+# Persistence
+# ============================================================
+async def add_focus_time(db: AsyncSession, user_id: int, seconds: float) -> list[tuple[int, float]]:
+    """Add a completed session's seconds to the user's global score and to
+    every challenge they belong to, in the caller's transaction.
+
+    Returns the new [(scope_id, total_sec)]; apply them with `apply()`
+    after commit.
+    """
+    insert_ = dialect_insert(db.bind.dialect.name)
+    scopes = select(ChallengeParticipant.challenge_id).where(ChallengeParticipant.user_id == user_id)
+    scope_ids = [GLOBAL_SCOPE, *(await db.scalars(scopes))]
+    stmt = insert_(FocusScore).values([
+        {"scope_id": scope_id, "user_id": user_id, "total_sec": seconds} for scope_id in scope_ids
+    ])
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[FocusScore.scope_id, FocusScore.user_id],
+        set_={"total_sec": FocusScore.total_sec + stmt.excluded.total_sec},
+    ).returning(FocusScore.scope_id, FocusScore.total_sec)
+    return [tuple(row) for row in await db.execute(stmt)]
+
+
+def apply(user_id: int, totals: list[tuple[int, float]]):
+    """Mirror committed totals; concurrent completions may arrive in either order."""
+    for scope_id, total in totals:
+        leaderboards.raise_to(scope_id, user_id, total)
+
+
+def recompute_scores(conn, user_ids: Iterable[int] | None = None) -> int:
+    """Rebuild focus_scores from completed sessions (global + per membership) of existing users.
+
+    user_ids limits the rebuild to those users' rows.
+    """
+    completed = FocusSession.status == SessionStatus.completed
+    wipe = delete(FocusScore)
+    global_scores = (
+        select(GLOBAL_SCOPE, FocusSession.user_id, func.sum(FocusSession.elapsed_sec))
+        .join(User, User.id == FocusSession.user_id)
+        .where(completed)
+    )
+    member_scores = (
+        select(ChallengeParticipant.challenge_id, ChallengeParticipant.user_id, func.sum(FocusSession.elapsed_sec))
+        .join(FocusSession, FocusSession.user_id == ChallengeParticipant.user_id)
+        .join(User, User.id == ChallengeParticipant.user_id)
+        .where(completed, FocusSession.completed_at >= ChallengeParticipant.joined_at)
+    )
+    if user_ids is not None:
+        user_ids = list(user_ids)
+        wipe = wipe.where(FocusScore.user_id.in_(user_ids))
+        global_scores = global_scores.where(FocusSession.user_id.in_(user_ids))
+        member_scores = member_scores.where(ChallengeParticipant.user_id.in_(user_ids))
+
+    conn.execute(wipe)
+    global_rows = conn.execute(insert(FocusScore).from_select(
+        ["scope_id", "user_id", "total_sec"], global_scores.group_by(FocusSession.user_id),
+    )).rowcount
+    member_rows = conn.execute(insert(FocusScore).from_select(
+        ["scope_id", "user_id", "total_sec"],
+        member_scores.group_by(ChallengeParticipant.challenge_id, ChallengeParticipant.user_id),
+    )).rowcount
+    return global_rows + member_rows
+
+
+def prune_scores(conn) -> int:
+    """Delete focus_scores rows of users that no longer exist."""
+    return conn.execute(delete(FocusScore).where(FocusScore.user_id.not_in(select(User.id)))).rowcount
+
+
+def main():
+    from .database import engine
+    from .migrations import upgrade
+
+    parser = argparse.ArgumentParser(description="Focus leaderboard maintenance")
+    sub = parser.add_subparsers(dest="command", required=True)
+    sub.add_parser("rebuild", help="recompute focus_scores from focus_sessions")
+    sub.add_parser("prune", help="delete focus_scores rows of deleted users")
+    args = parser.parse_args()
+
+    upgrade(engine)
+    with engine.begin() as conn:
+        if args.command == "prune":
+            print(f"Deleted {prune_scores(conn)} focus_scores rows of deleted users")
+            return
+        rows = recompute_scores(conn)
+    print(f"Rebuilt {rows} focus_scores rows")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,16 +1,39 @@
-from fastapi import FastAPI, Depends, HTTPException
+# imported first: it timestamps the start of the import for /api/metrics/startup
+from .startup import PRODUCTION, check_schema, state as startup_state, warm_up
+
+import asyncio
+import calendar
+import time
+from datetime import date, timedelta
+from fastapi import FastAPI, Depends, HTTPException, Query, Request, Response
+from fastapi.responses import JSONResponse, PlainTextResponse, StreamingResponse
+from sqlalchemy import case, delete, func, insert, not_, select, update
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
-from passlib.context import CryptContext
 from fastapi.middleware.cors import CORSMiddleware
 import json
 from pathlib import Path
+from tempfile import SpooledTemporaryFile
 from .focusTime import router as focus_router
 from .challenges import router as challenges_router
 
-from . import models, schemas
-from .database import engine, SessionLocal
+from . import admission, migrations, models, schemas
+from .admission import AdmissionMiddleware
+from .cache import challenge_cache
+from .focusActive import active_sessions
+from .leaderboard import leaderboards
+from .pubsub import get_broker
+from .database import async_engine, async_pool_stats, engine, pool_stats, SessionLocal, get_async_db, get_db, pool_status, write_engine
+from .metrics import MetricsMiddleware, install_sql_hooks, registry, render
+from .pagination import NEXT_CURSOR_HEADER, cursor_param, decode_cursor, fetch_limit, limit_param, page_limit, paginate
+from .serialization import RowSerializer, fast_json
+from .security import HashQueueFull, hash_password, hash_stats, pwd_context, verify_password
+from .tokens import check_token_user, issue_token, token_user_id, verifier as token_verifier
+from .transfer import IMPORT_MAX_BYTES, IMPORT_SPOOL_BYTES, KINDS, MEDIA_TYPE, InvalidRecord, import_lines, stream_export
 
-print("✅ Loaded: backend/main.py")
+if not PRODUCTION:
+    print("✅ Loaded: backend/main.py")
 
 
 
@@ -20,9 +43,9 @@ app = FastAPI()
 
 
 
-# Password hashing
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
-
+# Per-user rate limits and pool-saturation load shedding (429/503 + Retry-After);
+# added first so it runs inside CORS and rejections keep their CORS headers
+app.add_middleware(AdmissionMiddleware, router=app.router)
 
 app.add_middleware(
     CORSMiddleware,
@@ -34,26 +57,70 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=[NEXT_CURSOR_HEADER, "ETag", "Retry-After"],
 )
 
+# Per-route latency, SQL statement counts and DB vs Python time (see /metrics)
+app.add_middleware(MetricsMiddleware)
+install_sql_hooks(engine)
+install_sql_hooks(async_engine.sync_engine)
+
+
+@app.exception_handler(HashQueueFull)
+def hash_queue_full(request, exc):
+    return JSONResponse(
+        status_code=503,
+        content={"detail": "Too many sign-ins in progress, please retry"},
+        headers={"Retry-After": "1"},
+    )
 
-# Create database tables
+
+# Create/upgrade database tables (development) or check the schema version
+# (production), rebuild the in-process indexes, then warm up in the background
 @app.on_event("startup")
-def init_tables():
-    models.Base.metadata.create_all(bind=engine)
-    
+async def init_tables():
+    started = time.perf_counter()
+    if PRODUCTION:
+        startup_state.schema_version = await asyncio.to_thread(check_schema, engine)
+    else:
+        await asyncio.to_thread(migrations.upgrade, engine)
+        startup_state.schema_version = migrations.LATEST_VERSION
+    await asyncio.to_thread(_rebuild_indexes)
+    startup_state.startup_sec = time.perf_counter() - started
+    startup_state.status = "warming"
+    app.state.warm_up = asyncio.create_task(warm_up(engine, async_engine))
+
+
+def _rebuild_indexes():
+    with SessionLocal() as db:
+        active_sessions.rebuild(db)
+        leaderboards.rebuild(db)
+
+
+def _reload_user_indexes(user_id: int):
+    with SessionLocal() as db:
+        active_sessions.reload(db, [user_id])
+        leaderboards.reload(db, [user_id])
+
+
+@app.on_event("shutdown")
+async def close_pools():
+    startup_state.ready = False
+    startup_state.status = "shutting down"
+    warm_up_task = getattr(app.state, "warm_up", None)   # unset if startup failed early
+    if warm_up_task is not None:
+        warm_up_task.cancel()
+        await asyncio.gather(warm_up_task, return_exceptions=True)
+    await async_engine.dispose()
+    engine.dispose()
+
+
 app.include_router(focus_router)
 app.include_router(challenges_router)
 
 
 
-# Database dependency
-def get_db():
-    db = SessionLocal()
-    try:
-        yield db
-    finally:
-        db.close()
+# Database dependency: backend.database.get_db (write sessions for non-GET requests)
 
 
 #DB_FILE = Path("db.json")
@@ -75,18 +142,89 @@ def root():
     return {"message": "FastAPI backend is working!"}
 
 
+# Readiness probe: 200 once the pools are warm, 503 while starting or shutting down
+@app.get("/ready")
+def ready():
+    snapshot = startup_state.snapshot()
+    return JSONResponse(status_code=200 if startup_state.ready else 503, content=snapshot)
+
+
+# Import time, startup time and time-to-first-response of this process
+@app.get("/api/metrics/startup")
+def startup_metrics():
+    return startup_state.snapshot()
+
+
+# Connection pool telemetry (checkout wait, in-use connections, overflow)
+@app.get("/api/metrics/db-pool")
+def db_pool_metrics():
+    return pool_status()
+
+
+# Password hashing executor (latency, queue depth, rejections)
+@app.get("/api/metrics/hashing")
+def hashing_metrics():
+    return hash_stats.snapshot()
+
+
+# Challenge read cache (hit rate, 304s, invalidations, evictions)
+@app.get("/api/metrics/challenge-cache")
+def challenge_cache_metrics():
+    return challenge_cache.snapshot()
+
+
+# Live-update fan-out (open streams, published/delivered events)
+@app.get("/api/metrics/pubsub")
+def pubsub_metrics():
+    return get_broker().snapshot()
+
+
+# Admission control (admitted / shed requests, in flight, pool wait signal)
+@app.get("/api/metrics/admission")
+def admission_metrics():
+    return admission.snapshot()
+
+
+# Session token verification (LRU hits/misses, rejected tokens)
+@app.get("/api/metrics/tokens")
+def token_metrics():
+    return token_verifier.snapshot()
+
+
+# Most recent statements slower than SLOW_QUERY_MS, with their route
+@app.get("/api/metrics/slow-queries")
+def slow_query_metrics():
+    return registry.slow_queries()
+
+
+# Prometheus scrape endpoint: request/DB metrics plus the counters above
+@app.get("/metrics", response_class=PlainTextResponse)
+def prometheus_metrics():
+    body = render({
+        "studyhub_db_pool_sync": pool_stats.snapshot(engine.pool),
+        "studyhub_db_pool_async": async_pool_stats.snapshot(async_engine.sync_engine.pool),
+        "studyhub_hashing": hash_stats.snapshot(),
+        "studyhub_challenge_cache": challenge_cache.snapshot(),
+        "studyhub_pubsub": get_broker().snapshot(),
+        "studyhub_startup": startup_state.snapshot(),
+        "studyhub_tokens": token_verifier.snapshot(),
+        "studyhub_admission": admission.snapshot(),
+    })
+    return PlainTextResponse(body, media_type="text/plain; version=0.0.4")
+
+
 # Register endpoint
 @app.post("/api/register")
-def register(user: schemas.UserCreate, db: Session = Depends(get_db)):
-    existing_user = db.query(models.User).filter(models.User.email == user.email).first()
+async def register(user: schemas.UserCreate, db: AsyncSession = Depends(get_async_db)):
+    existing_user = await db.scalar(select(models.User).where(models.User.email == user.email))
     if existing_user:
         raise HTTPException(status_code=400, detail="Email already registered")
 
-    hashed_password = pwd_context.hash(user.password)
+    hashed_password = await hash_password(user.password)
     new_user = models.User(name=user.name, email=user.email, password=hashed_password)
     db.add(new_user)
-    db.commit()
-    db.refresh(new_user)
+    await db.commit()
+    await db.refresh(new_user)
 
     # Save to db.json
     # save_to_json({"id": new_user.id, "name": new_user.name, "email": new_user.email, "password": user.password})
@@ -96,7 +234,7 @@ def register(user: schemas.UserCreate, db: Session = Depends(get_db)):
 
 # Login endpoint
 @app.post("/api/login")
-def login(user: dict, db: Session = Depends(get_db)):
+async def login(user: dict, db: AsyncSession = Depends(get_async_db)):
     email = user.get("email")
     password = user.get("password")
 
@@ -112,61 +250,291 @@ def login(user: dict, db: Session = Depends(get_db)):
     #if not found_user:
         #raise HTTPException(status_code=401, detail="Invalid email or password")
     
-    db_user = db.query(models.User).filter(models.User.email == email).first()
+    db_user = await db.scalar(select(models.User).where(models.User.email == email))
 
-    if not db_user or not pwd_context.verify(password, db_user.password):
+    if not db_user or not await verify_password(password, db_user.password):
         raise HTTPException(status_code=401, detail="Invalid email or password")
 
+    # Upgrade hashes made with a different BCRYPT_ROUNDS while we hold the password;
+    # best effort, a busy hash queue must not fail an authenticated login
+    if pwd_context().needs_update(db_user.password):
+        try:
+            db_user.password = await hash_password(password)
+        except HashQueueFull:
+            pass
+        else:
+            await db.commit()
+            hash_stats.incr("rehashed")
 
+
+    token, expires_at = issue_token(db_user.id)
     return {
         "message": "Login successful",
         "id": db_user.id,
         "name": db_user.name,
-        "email": db_user.email
+        "email": db_user.email,
+        "token": token,
+        "token_type": "bearer",
+        "expires_at": expires_at,
     }
 
 
 
+def _require_user(db: Session, user_id: int, token_user: int | None = None):
+    """A valid token for `user_id` proves the user exists; otherwise look it up."""
+    check_token_user(token_user, user_id)
+    if token_user is not None:
+        return
+    if db.scalar(select(models.User.id).where(models.User.id == user_id)) is None:
+        raise HTTPException(status_code=404, detail="User not found")
+
+
+def _user_gone(db: Session):
+    """The goals.user_id FK rejected an insert: the token outlived its user."""
+    db.rollback()
+    raise HTTPException(status_code=404, detail="User not found")
+
+
 # Goals endpoint
 @app.post("/api/goals", response_model=schemas.GoalResponse)
-def create_goal(goal: schemas.GoalCreate, db: Session = Depends(get_db)):
-    # Check if user exists
-    user = db.query(models.User).filter(models.User.id == goal.user_id).first()
-    if not user:
-        raise HTTPException(status_code=404, detail="User not found")
+def create_goal(
+    goal: schemas.GoalCreate,
+    db: Session = Depends(get_db),
+    token_user: int | None = Depends(token_user_id),
+):
+    _require_user(db, goal.user_id, token_user)
 
-    new_goal = models.Goal(
-        title=goal.title,
-        completed=goal.completed,
-        date=goal.date,
-        user_id=goal.user_id,
-        color=goal.color 
-    )
-    db.add(new_goal)
+    try:
+        new_goal = db.scalar(insert(models.Goal).values(
+            title=goal.title,
+            completed=goal.completed,
+            date=goal.date,
+            user_id=goal.user_id,
+            color=goal.color
+        ).returning(models.Goal))
+    except IntegrityError:
+        _user_gone(db)
+    response = schemas.GoalResponse.model_validate(new_goal)   # before commit expires the row
     db.commit()
-    db.refresh(new_goal)
-    return new_goal
+    return response
+
+
+_goal_rows = RowSerializer(schemas.GoalResponse, models.Goal.__table__)
 
 
 @app.get("/api/goals/{user_id}", response_model=list[schemas.GoalResponse])
-def get_user_goals(user_id: int, db: Session = Depends(get_db)):
+def get_user_goals(
+    user_id: int,
+    response: Response,
+    completed: bool | None = None,
+    date_from: date | None = Query(None, description="YYYY-MM-DD, inclusive"),
+    date_to: date | None = Query(None, description="YYYY-MM-DD, inclusive"),
+    cursor: str | None = cursor_param(),
+    limit: int | None = limit_param(None),
+    db: Session = Depends(get_db),
+):
     if not isinstance(user_id, int) or user_id <= 0:
         raise HTTPException(status_code=400, detail="Invalid user ID")
-    return db.query(models.Goal).filter(models.Goal.user_id == user_id).all()
+    fast = fast_json("get_user_goals")
+    q = db.query(*_goal_rows.columns) if fast else db.query(models.Goal)
+    q = q.filter(models.Goal.user_id == user_id)
+    if completed is not None:
+        q = q.filter(models.Goal.completed == completed)
+    if date_from is not None:
+        q = q.filter(models.Goal.date >= date_from)
+    if date_to is not None:
+        q = q.filter(models.Goal.date <= date_to)
+    if cursor:
+        (after_id,) = decode_cursor(cursor, int)
+        q = q.filter(models.Goal.id > after_id)
+    limit = page_limit(limit, cursor)    # GoalContext fetches every goal unpaged
+    goals = paginate(q.order_by(models.Goal.id).limit(fetch_limit(limit)).all(), limit, response, key=lambda g: (g.id,))
+    return _goal_rows.response(goals, response) if fast else goals
+
+
+@app.get("/api/goals/{user_id}/calendar", response_model=schemas.GoalCalendar)
+def get_goal_calendar(
+    user_id: int,
+    year: int = Query(..., ge=1970, le=9999),
+    month: int = Query(..., ge=1, le=12),
+    db: Session = Depends(get_db),
+):
+    """Per-day goal totals and completed counts for one month, from one GROUP BY."""
+    first = date(year, month, 1)
+    days_in_month = calendar.monthrange(year, month)[1]
+    rows = db.execute(
+        select(models.Goal.date, func.count(models.Goal.id), func.sum(case((models.Goal.completed, 1), else_=0)))
+        .where(
+            models.Goal.user_id == user_id,
+            models.Goal.date >= first,
+            models.Goal.date <= first + timedelta(days=days_in_month - 1),
+        )
+        .group_by(models.Goal.date)
+    ).all()
+    counts = {day: (total, completed or 0) for day, total, completed in rows}
+    days = [
+        schemas.GoalCalendarDay(date=day, total=counts.get(day, (0, 0))[0], completed=counts.get(day, (0, 0))[1])
+        for day in (first + timedelta(days=i) for i in range(days_in_month))
+    ]
+    return schemas.GoalCalendar(
+        user_id=user_id,
+        year=year,
+        month=month,
+        total=sum(d.total for d in days),
+        completed=sum(d.completed for d in days),
+        days=days,
+    )
 
 
 @app.put("/api/goals/{goal_id}", response_model=schemas.GoalResponse)
 def update_goal(goal_id: int, db: Session = Depends(get_db)):
-    goal = db.query(models.Goal).filter(models.Goal.id == goal_id).first()
-    if not goal:
+    """Toggle `completed` atomically: one UPDATE ... RETURNING, no read first."""
+    goal = db.scalar(
+        update(models.Goal)
+        .where(models.Goal.id == goal_id)
+        .values(completed=not_(models.Goal.completed))
+        .returning(models.Goal)
+        .execution_options(synchronize_session=False)
+    )
+    if goal is None:
+        db.rollback()
         raise HTTPException(status_code=404, detail="Goal not found")
-    goal.completed = not goal.completed
+    response = schemas.GoalResponse.model_validate(goal)   # before commit expires the row
+    db.commit()
+    return response
+
+# ============================================================
+# Batch goal endpoints: one user check, one statement, one commit
+# ============================================================
+def _batch_results(ids: list[int], found: dict, status: str) -> schemas.GoalBatchResponse:
+    """Per-item outcome in request order; ids the statement didn't touch are not_found."""
+    return schemas.GoalBatchResponse(results=[
+        schemas.GoalBatchResult(id=goal_id, status=status, goal=found[goal_id])
+        if goal_id in found else schemas.GoalBatchResult(id=goal_id, status="not_found")
+        for goal_id in ids
+    ])
+
+
+@app.post("/api/goals/batch", response_model=schemas.GoalBatchResponse)
+def create_goals(
+    batch: schemas.GoalBatchCreate,
+    db: Session = Depends(get_db),
+    token_user: int | None = Depends(token_user_id),
+):
+    _require_user(db, batch.user_id, token_user)
+    try:
+        goals = db.scalars(
+            insert(models.Goal).returning(models.Goal, sort_by_parameter_order=True),
+            [{**item.model_dump(), "user_id": batch.user_id} for item in batch.goals],
+        ).all()
+    except IntegrityError:
+        _user_gone(db)
+    # built before commit, which would expire the RETURNING rows and reload each one
+    response = schemas.GoalBatchResponse(results=[
+        schemas.GoalBatchResult(id=goal.id, status="created", goal=goal) for goal in goals
+    ])
+    db.commit()
+    return response
+
+
+@app.post("/api/goals/batch/toggle", response_model=schemas.GoalBatchResponse)
+def toggle_goals(
+    batch: schemas.GoalBatchIds,
+    db: Session = Depends(get_db),
+    token_user: int | None = Depends(token_user_id),
+):
+    _require_user(db, batch.user_id, token_user)
+    ids = list(dict.fromkeys(batch.ids))
+    toggled = db.scalars(
+        update(models.Goal)
+        .where(models.Goal.id.in_(ids), models.Goal.user_id == batch.user_id)
+        .values(completed=not_(models.Goal.completed))
+        .returning(models.Goal)
+        .execution_options(synchronize_session=False)
+    ).all()
+    response = _batch_results(ids, {goal.id: goal for goal in toggled}, "toggled")
     db.commit()
-    db.refresh(goal)
-    return goal
+    return response
+
+
+@app.post("/api/goals/batch/delete", response_model=schemas.GoalBatchResponse)
+def delete_goals(
+    batch: schemas.GoalBatchIds,
+    db: Session = Depends(get_db),
+    token_user: int | None = Depends(token_user_id),
+):
+    _require_user(db, batch.user_id, token_user)
+    ids = list(dict.fromkeys(batch.ids))
+    deleted = db.scalars(
+        delete(models.Goal)
+        .where(models.Goal.id.in_(ids), models.Goal.user_id == batch.user_id)
+        .returning(models.Goal.id)
+        .execution_options(synchronize_session=False)
+    ).all()
+    db.commit()
+    return _batch_results(ids, dict.fromkeys(deleted), "deleted")
+
+
+
+# User data export/import as NDJSON (format in backend/transfer.py)
+def _check_user(user_id: int, token_user: int | None):
+    """_require_user on a short-lived session, so no connection is held while streaming."""
+    with SessionLocal() as db:
+        _require_user(db, user_id, token_user)
+
+
+@app.get("/api/users/{user_id}/export")
+def export_user_data(
+    user_id: int,
+    kinds: str | None = Query(None, description="comma-separated record types (default: all)"),
+    token_user: int | None = Depends(token_user_id),
+):
+    _check_user(user_id, token_user)
+    selected = [kind.strip() for kind in kinds.split(",") if kind.strip()] if kinds else list(KINDS)
+    unknown = [kind for kind in selected if kind not in KINDS]
+    if unknown:
+        raise HTTPException(status_code=400, detail=f"Unknown record types: {', '.join(unknown)}")
+    return StreamingResponse(
+        stream_export(engine, user_id, selected),
+        media_type=MEDIA_TYPE,
+        headers={"Content-Disposition": f'attachment; filename="studyhub-user-{user_id}.ndjson"'},
+    )
+
+
+@app.post("/api/users/{user_id}/import", response_model=schemas.ImportSummary)
+async def import_user_data(
+    user_id: int,
+    request: Request,
+    token_user: int | None = Depends(token_user_id),
+):
+    """Body: an NDJSON export. Every row is assigned to `user_id`."""
+    await asyncio.to_thread(_check_user, user_id, token_user)
+    # spooled first so a slow upload does not hold a write transaction open
+    with SpooledTemporaryFile(max_size=IMPORT_SPOOL_BYTES) as body:
+        size = 0
+        async for chunk in request.stream():
+            size += len(chunk)
+            if size > IMPORT_MAX_BYTES:
+                raise HTTPException(status_code=413, detail=f"Import is larger than {IMPORT_MAX_BYTES} bytes")
+            body.write(chunk)
+        body.seek(0)
+        try:
+            summary = await asyncio.to_thread(import_lines, write_engine, body, user_id)
+        except InvalidRecord as exc:
+            raise HTTPException(status_code=400, detail=f"Nothing imported: {exc}")
+
+    if any(summary["imported"].values()):
+        await asyncio.to_thread(_reload_user_indexes, user_id)
+        challenge_cache.clear()
+    return summary
 
 @app.on_event("startup")
 def show_routes():
+    if PRODUCTION:
+        return
     print("\n🚀 Registered FastAPI Routes:")
     for route in app.routes:
         print(" →", route.path)
+
+
+startup_state.imported()
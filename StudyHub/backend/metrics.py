@@ -0,0 +1,257 @@
+"""Per-request instrumentation and the Prometheus `/metrics` exposition.
+
+`MetricsMiddleware` times every HTTP request. The SQLAlchemy cursor hooks
+(installed on both engines by `install_sql_hooks`) attribute each
+statement to the request running it through a context variable, so a
+route's latency splits into DB time and everything else ("python" time:
+validation, ORM, serialization, waiting on the pool). Statements slower
+than SLOW_QUERY_MS are logged with their text and kept for
+/api/metrics/slow-queries.
+"""
+import logging
+import os
+import time
+from collections import deque
+from contextvars import ContextVar
+from threading import Lock
+
+from sqlalchemy import event
+
+logger = logging.getLogger("studyhub.sql")
+
+# ============================================================
+# Settings
+# ============================================================
+SLOW_QUERY_MS = float(os.getenv("SLOW_QUERY_MS", "200"))
+SLOW_QUERY_KEEP = int(os.getenv("SLOW_QUERY_KEEP", "50"))    # recent slow statements kept in memory
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+STATEMENT_BUCKETS = (0, 1, 2, 3, 5, 8, 13, 21, 50)
+
+
+class RequestStats:
+    __slots__ = ("scope", "statements", "db_sec")
+
+    def __init__(self, scope):
+        self.scope = scope
+        self.statements = 0
+        self.db_sec = 0.0
+
+    @property
+    def route(self) -> str:
+        """Route template (e.g. /api/goals/{goal_id}); set once routing matched."""
+        route = self.scope.get("route")
+        return getattr(route, "path", "unmatched")
+
+
+_current: ContextVar[RequestStats | None] = ContextVar("studyhub_request_stats", default=None)
+
+
+class Histogram:
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * len(buckets)
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, value: float):
+        self.count += 1
+        self.sum += value
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                self.counts[i] += 1
+
+
+class RouteStats:
+    def __init__(self):
+        self.latency = Histogram(LATENCY_BUCKETS)
+        self.statements = Histogram(STATEMENT_BUCKETS)
+        self.db_sec = 0.0
+        self.python_sec = 0.0
+        self.status = {}   # status code -> count
+
+
+class Registry:
+    def __init__(self):
+        self._lock = Lock()
+        self.routes: dict[tuple[str, str], RouteStats] = {}
+        self.statements_total = 0
+        self.statements_outside_requests = 0
+        self.db_sec_total = 0.0
+        self.slow_total = 0
+        self.slow: deque = deque(maxlen=SLOW_QUERY_KEEP)
+        self.first_response_at: float | None = None   # perf_counter() when the first response finished
+
+    def record_request(self, method: str, route: str, status: int, elapsed: float, stats: RequestStats):
+        with self._lock:
+            if self.first_response_at is None:
+                self.first_response_at = time.perf_counter()
+            entry = self.routes.get((method, route))
+            if entry is None:
+                entry = self.routes[(method, route)] = RouteStats()
+            entry.latency.observe(elapsed)
+            entry.statements.observe(stats.statements)
+            entry.db_sec += stats.db_sec
+            entry.python_sec += max(elapsed - stats.db_sec, 0.0)
+            entry.status[status] = entry.status.get(status, 0) + 1
+
+    def record_statement(self, statement: str, elapsed: float, stats: RequestStats | None):
+        with self._lock:
+            self.statements_total += 1
+            self.db_sec_total += elapsed
+            if stats is None:
+                self.statements_outside_requests += 1
+        if stats is not None:
+            stats.statements += 1
+            stats.db_sec += elapsed
+        if elapsed * 1000 >= SLOW_QUERY_MS:
+            route = stats.route if stats is not None else None
+            text = " ".join(statement.split())
+            with self._lock:
+                self.slow_total += 1
+                self.slow.append({"ms": round(elapsed * 1000, 3), "route": route, "statement": text})
+            logger.warning("slow query %.1fms route=%s: %s", elapsed * 1000, route, text)
+
+    def slow_queries(self) -> list[dict]:
+        with self._lock:
+            return list(self.slow)
+
+
+registry = Registry()
+
+
+# ============================================================
+# Middleware
+# ============================================================
+class MetricsMiddleware:
+    """Pure ASGI middleware (no extra task), so the context variable set
+    here is visible to the route, its threadpool worker and the DB hooks.
+    Server-Sent Event streams are left out of the latency histograms."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+
+        stats = RequestStats(scope)
+        token = _current.set(stats)
+        status = 500
+        streaming = False
+
+        async def send_wrapper(message):
+            nonlocal status, streaming
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                for name, value in message.get("headers", ()):
+                    if name == b"content-type" and value.startswith(b"text/event-stream"):
+                        streaming = True
+            await send(message)
+
+        started = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            elapsed = time.perf_counter() - started
+            _current.reset(token)
+            if not streaming:
+                registry.record_request(scope["method"], stats.route, status, elapsed, stats)
+
+
+# ============================================================
+# SQL hooks
+# ============================================================
+def install_sql_hooks(sync_engine):
+    """Time every cursor execution on `sync_engine` (use .sync_engine for async)."""
+
+    # the start time rides on the execution context, so a failed statement
+    # (no after_cursor_execute) leaves nothing behind
+    @event.listens_for(sync_engine, "before_cursor_execute")
+    def _before(conn, cursor, statement, parameters, context, executemany):
+        if context is not None:
+            context._studyhub_started = time.perf_counter()
+
+    @event.listens_for(sync_engine, "after_cursor_execute")
+    def _after(conn, cursor, statement, parameters, context, executemany):
+        started = getattr(context, "_studyhub_started", None)
+        if started is not None:
+            registry.record_statement(statement, time.perf_counter() - started, _current.get())
+
+
+# ============================================================
+# Prometheus text exposition
+# ============================================================
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _labels(**labels) -> str:
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{k}="{_escape(v)}"' for k, v in labels.items()) + "}"
+
+
+def _histogram(lines, name, hist: Histogram, **labels):
+    for bound, count in zip(hist.buckets, hist.counts):
+        lines.append(f"{name}_bucket{_labels(**labels, le=bound)} {count}")
+    lines.append(f"{name}_bucket{_labels(**labels, le='+Inf')} {hist.count}")
+    lines.append(f"{name}_sum{_labels(**labels)} {hist.sum}")
+    lines.append(f"{name}_count{_labels(**labels)} {hist.count}")
+
+
+def _gauges(lines, prefix: str, snapshot: dict, **labels):
+    """Expose the numeric fields of a JSON metrics snapshot as gauges."""
+    for key, value in snapshot.items():
+        if isinstance(value, bool) or not isinstance(value, (int, float)):
+            continue
+        name = f"{prefix}_{key}"
+        lines.append(f"# TYPE {name} gauge")
+        lines.append(f"{name}{_labels(**labels)} {value}")
+
+
+def render(snapshots: dict[str, dict]) -> str:
+    """Prometheus text format for request/DB metrics plus `snapshots`,
+    a {metric_prefix: snapshot_dict} map of the /api/metrics/* counters."""
+    lines = []
+    with registry._lock:
+        routes = sorted(registry.routes.items())
+
+        lines.append("# HELP studyhub_http_request_duration_seconds Request latency by route.")
+        lines.append("# TYPE studyhub_http_request_duration_seconds histogram")
+        for (method, route), entry in routes:
+            _histogram(lines, "studyhub_http_request_duration_seconds", entry.latency, method=method, route=route)
+
+        lines.append("# HELP studyhub_http_requests_total Requests by route and status.")
+        lines.append("# TYPE studyhub_http_requests_total counter")
+        for (method, route), entry in routes:
+            for status, count in sorted(entry.status.items()):
+                lines.append(f"studyhub_http_requests_total{_labels(method=method, route=route, status=status)} {count}")
+
+        lines.append("# HELP studyhub_db_statements_per_request SQL statements issued per request.")
+        lines.append("# TYPE studyhub_db_statements_per_request histogram")
+        for (method, route), entry in routes:
+            _histogram(lines, "studyhub_db_statements_per_request", entry.statements, method=method, route=route)
+
+        lines.append("# HELP studyhub_request_db_seconds_total Time spent executing SQL, by route.")
+        lines.append("# TYPE studyhub_request_db_seconds_total counter")
+        for (method, route), entry in routes:
+            lines.append(f"studyhub_request_db_seconds_total{_labels(method=method, route=route)} {entry.db_sec}")
+
+        lines.append("# HELP studyhub_request_python_seconds_total Request time outside SQL execution, by route.")
+        lines.append("# TYPE studyhub_request_python_seconds_total counter")
+        for (method, route), entry in routes:
+            lines.append(f"studyhub_request_python_seconds_total{_labels(method=method, route=route)} {entry.python_sec}")
+
+        lines.append("# TYPE studyhub_db_statements_total counter")
+        lines.append(f"studyhub_db_statements_total {registry.statements_total}")
+        lines.append("# TYPE studyhub_db_statements_outside_requests_total counter")
+        lines.append(f"studyhub_db_statements_outside_requests_total {registry.statements_outside_requests}")
+        lines.append("# TYPE studyhub_db_seconds_total counter")
+        lines.append(f"studyhub_db_seconds_total {registry.db_sec_total}")
+        lines.append("# TYPE studyhub_db_slow_statements_total counter")
+        lines.append(f"studyhub_db_slow_statements_total {registry.slow_total}")
+
+    for prefix, snapshot in snapshots.items():
+        _gauges(lines, prefix, snapshot)
+    return "\n".join(lines) + "\n"
@@ -0,0 +1,300 @@
+"""Versioned schema migrations.
+
+Each step runs once, in order, inside one transaction, and is recorded in
+the schema_migrations table. Steps must be idempotent against databases
+that were created by the old `create_all()` startup hook.
+
+    python -m backend.migrations            # upgrade to the latest version
+    python -m backend.migrations --status   # print current/latest version
+"""
+import argparse
+import json
+import logging
+from datetime import date, datetime
+
+from sqlalchemy import (
+    Boolean, Column, Date, DateTime, Integer, MetaData, String, Table, bindparam, func, insert, inspect, select, text,
+)
+
+from . import models
+
+_meta = MetaData()
+schema_migrations = Table(
+    "schema_migrations",
+    _meta,
+    Column("version", Integer, primary_key=True),
+    Column("name", String, nullable=False),
+    Column("applied_at", DateTime, nullable=False, default=datetime.utcnow),
+)
+
+# goals whose free-form date migration 8 could not parse, moved aside as they were
+goals_quarantine = Table(
+    "goals_quarantine",
+    _meta,
+    Column("id", Integer, primary_key=True),
+    Column("user_id", Integer, nullable=False),
+    Column("title", String, nullable=False),
+    Column("completed", Boolean),
+    Column("raw_date", String),
+    Column("color", String),
+    Column("quarantined_at", DateTime, nullable=False, default=datetime.utcnow),
+)
+
+logger = logging.getLogger("studyhub.migrations")
+
+MIGRATIONS = []  # [(version, name, fn(conn))]
+_ADVISORY_LOCK_ID = 727274  # serializes concurrent upgrades on Postgres
+
+
+def migration(version: int, name: str):
+    def register(fn):
+        assert not MIGRATIONS or MIGRATIONS[-1][0] < version, "migrations must be declared in order"
+        MIGRATIONS.append((version, name, fn))
+        return fn
+    return register
+
+
+def _create_indexes(conn, *indexes):
+    for index in indexes:
+        index.create(conn, checkfirst=True)
+
+
+def _index(table, name):
+    return next(i for i in table.indexes if i.name == name)
+
+
+def _columns(conn, table_name) -> set[str]:
+    return {c["name"] for c in inspect(conn).get_columns(table_name)}
+
+
+def _add_column(conn, table_name, column_name, ddl):
+    """ALTER TABLE ... ADD COLUMN unless the baseline already created it."""
+    if column_name not in _columns(conn, table_name):
+        conn.execute(text(f"ALTER TABLE {table_name} ADD COLUMN {column_name} {ddl}"))
+
+
+def _json_value(value, default):
+    if value is None:
+        return default
+    return json.loads(value) if isinstance(value, str) else value
+
+
+# ============================================================
+# Migrations
+# ============================================================
+@migration(1, "baseline tables")
+def _baseline(conn):
+    models.Base.metadata.create_all(conn)
+
+
+@migration(2, "composite and partial indexes for hot router queries")
+def _hot_query_indexes(conn):
+    focus = models.FocusSession.__table__
+    challenges = models.Challenge.__table__
+    _create_indexes(
+        conn,
+        _index(focus, "ix_focus_sessions_user_started"),
+        _index(focus, "ix_focus_sessions_running"),
+        _index(models.Goal.__table__, "ix_goals_user_id_id"),
+        _index(challenges, "ix_challenges_level_id"),
+        _index(challenges, "ix_challenges_creator_id_id"),
+        _index(models.ChallengeTask.__table__, "ix_challenge_tasks_challenge_id"),
+    )
+
+
+
+@migration(3, "challenge_participants association table")
+def _challenge_participants(conn):
+    participants = models.ChallengeParticipant.__table__
+    participants.create(conn, checkfirst=True)
+    _add_column(conn, "challenges", "participant_count", "INTEGER NOT NULL DEFAULT 0")
+
+    # Backfill from the legacy participants/progress JSON columns, if present
+    if not {"participants", "progress"} <= _columns(conn, "challenges"):
+        return
+    rows = []
+    for challenge_id, members, progress in conn.execute(text("SELECT id, participants, progress FROM challenges")):
+        progress = _json_value(progress, {})
+        for user_id in dict.fromkeys(_json_value(members, [])):
+            rows.append({
+                "challenge_id": challenge_id,
+                "user_id": int(user_id),
+                "progress": float(progress.get(str(user_id), 0.0)),
+                "joined_at": datetime.utcnow(),
+            })
+    if rows:
+        conn.execute(insert(participants), rows)
+    conn.execute(text(
+        "UPDATE challenges SET participant_count = "
+        "(SELECT COUNT(*) FROM challenge_participants p WHERE p.challenge_id = challenges.id)"
+    ))
+
+
+@migration(4, "running progress sum on challenges")
+def _challenge_progress_sum(conn):
+    _add_column(conn, "challenges", "progress_sum", "FLOAT NOT NULL DEFAULT 0")
+    if conn.dialect.name == "postgresql":
+        conn.execute(text("ALTER TABLE challenges ALTER COLUMN group_progress TYPE DOUBLE PRECISION"))
+    conn.execute(text(
+        "UPDATE challenges SET progress_sum = COALESCE("
+        "(SELECT SUM(p.progress) FROM challenge_participants p WHERE p.challenge_id = challenges.id), 0)"
+    ))
+    conn.execute(text(
+        "UPDATE challenges SET group_progress = CASE WHEN participant_count > 0 "
+        "THEN ROUND(CAST(progress_sum / participant_count AS NUMERIC), 2) ELSE 0 END"
+    ))
+
+
+@migration(5, "persistent challenge comments")
+def _comments(conn):
+    models.Comment.__table__.create(conn, checkfirst=True)
+
+
+@migration(6, "resumed_at for server-derived focus timers")
+def _focus_resumed_at(conn):
+    _add_column(conn, "focus_sessions", "resumed_at", "TIMESTAMP")
+    # best estimate for sessions already running: their last state change
+    conn.execute(text(
+        "UPDATE focus_sessions SET resumed_at = COALESCE(updated_at, started_at) "
+        "WHERE status = 'running' AND resumed_at IS NULL"
+    ))
+
+
+@migration(7, "focus leaderboard scores")
+def _focus_scores(conn):
+    from .leaderboard import recompute_scores
+
+    models.FocusScore.__table__.create(conn, checkfirst=True)
+    recompute_scores(conn)
+
+
+# tried in order; strptime also takes unpadded months and days ("2025-1-5")
+_GOAL_DATE_FORMATS = (
+    "%Y-%m-%d", "%Y/%m/%d", "%Y.%m.%d", "%Y%m%d",
+    "%m/%d/%Y", "%d/%m/%Y", "%d.%m.%Y", "%d-%m-%Y",    # month first when ambiguous, as the en-US UI
+    "%B %d, %Y", "%b %d, %Y", "%d %B %Y", "%d %b %Y",
+)
+
+
+def _parse_goal_date(value) -> date | None:
+    if isinstance(value, date):
+        return value
+    text_value = str(value).strip()
+    try:
+        return date.fromisoformat(text_value[:10])     # YYYY-MM-DD, also ISO datetimes
+    except ValueError:
+        pass
+    # "2025-1-5T08:00" / "2025-1-5 08:00": the date part is enough
+    for candidate in dict.fromkeys((text_value, text_value.split("T")[0], text_value.split(" ")[0])):
+        for fmt in _GOAL_DATE_FORMATS:
+            try:
+                return datetime.strptime(candidate, fmt).date()
+            except ValueError:
+                pass
+    return None
+
+
+@migration(8, "typed goals.date with (user_id, date) index")
+def _goal_dates(conn):
+    """Normalize the free-form strings to YYYY-MM-DD, then retype the column.
+
+    SQLite cannot ALTER a column type, but SQLAlchemy's Date is stored
+    there as YYYY-MM-DD text anyway, so normalizing is all it needs.
+    Goals whose date still does not parse are moved, raw text included,
+    to goals_quarantine and logged, rather than blocking the upgrade.
+    """
+    goals = models.Goal.__table__
+    fixes, bad = [], []
+    for goal_id, value in conn.execute(text("SELECT id, date FROM goals")):
+        parsed = _parse_goal_date(value)
+        if parsed is None:
+            bad.append(goal_id)
+        elif not isinstance(value, date) and value != parsed.isoformat():
+            fixes.append({"goal_id": goal_id, "value": parsed.isoformat()})
+    goals_quarantine.create(conn, checkfirst=True)
+    if bad:
+        for start in range(0, len(bad), 500):
+            chunk = bad[start:start + 500]
+            rows = conn.execute(
+                text("SELECT id, user_id, title, completed, date, color FROM goals WHERE id IN :ids")
+                .bindparams(bindparam("ids", expanding=True)),
+                {"ids": chunk},
+            )
+            conn.execute(insert(goals_quarantine), [
+                {"id": goal_id, "user_id": user_id, "title": title, "completed": completed,
+                 "raw_date": None if raw is None else str(raw), "color": color}
+                for goal_id, user_id, title, completed, raw, color in rows
+            ])
+            conn.execute(
+                text("DELETE FROM goals WHERE id IN :ids").bindparams(bindparam("ids", expanding=True)),
+                {"ids": chunk},
+            )
+        logger.warning(
+            "goals.date: moved %d goals with unparseable dates to goals_quarantine (ids %s)", len(bad), sorted(bad)[:20]
+        )
+    if fixes:
+        conn.execute(text("UPDATE goals SET date = :value WHERE id = :goal_id"), fixes)
+
+    column = next(c for c in inspect(conn).get_columns("goals") if c["name"] == "date")
+    if conn.dialect.name == "postgresql" and not isinstance(column["type"], Date):
+        conn.execute(text('ALTER TABLE goals ALTER COLUMN "date" TYPE DATE USING "date"::date'))
+    _create_indexes(conn, _index(goals, "ix_goals_user_date"))
+
+
+
+@migration(9, "backfill focus_daily_stats")
+def _focus_daily_stats(conn):
+    """The rollup is only kept in step from the focus router onward; fill it
+    for sessions recorded before that."""
+    from .focusStats import rebuild_daily_stats
+
+    models.FocusDailyStats.__table__.create(conn, checkfirst=True)
+    rebuild_daily_stats(conn, commit=False)
+
+
+LATEST_VERSION = MIGRATIONS[-1][0]
+
+
+# ============================================================
+# Runner
+# ============================================================
+def current_version(conn) -> int:
+    if not conn.dialect.has_table(conn, schema_migrations.name):
+        return 0
+    return conn.execute(select(func.coalesce(func.max(schema_migrations.c.version), 0))).scalar_one()
+
+
+def upgrade(engine) -> list[int]:
+    """Apply pending migrations; returns the versions applied."""
+    applied = []
+    with engine.begin() as conn:
+        if conn.dialect.name == "postgresql":
+            conn.execute(text("SELECT pg_advisory_xact_lock(:id)"), {"id": _ADVISORY_LOCK_ID})
+        schema_migrations.create(conn, checkfirst=True)
+        version = current_version(conn)
+        for step, name, fn in MIGRATIONS:
+            if step <= version:
+                continue
+            fn(conn)
+            conn.execute(insert(schema_migrations).values(version=step, name=name))
+            applied.append(step)
+    return applied
+
+
+def main():
+    from .database import engine
+
+    parser = argparse.ArgumentParser(description="Schema migrations")
+    parser.add_argument("--status", action="store_true", help="show versions without upgrading")
+    args = parser.parse_args()
+
+    if args.status:
+        with engine.connect() as conn:
+            print(f"current={current_version(conn)} latest={LATEST_VERSION}")
+        return
+    applied = upgrade(engine)
+    print(f"Applied migrations: {applied}" if applied else "Schema is up to date")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,10 +1,9 @@
-from sqlalchemy import Column, Integer, String, Boolean, Float, DateTime, Enum, ForeignKey, Date, Text
+from sqlalchemy import Column, Integer, String, Boolean, Float, DateTime, Enum, ForeignKey, Date, Text, Index
 import enum
 from datetime import datetime
 from sqlalchemy.orm import relationship
 from sqlalchemy import Column, Integer, String
 from .database import Base
-from sqlalchemy.types import JSON
 
 
 class User(Base):
@@ -28,13 +27,20 @@ class Goal(Base):
     id = Column(Integer, primary_key=True, index=True)
     title = Column(String, nullable=False)
     completed = Column(Boolean, default=False)
-    date = Column(String, nullable=False)
+    date = Column(Date, nullable=False)
     color = Column(String, nullable=True)
 
     user_id = Column(Integer, ForeignKey("users.id"), nullable=False)
 
     user = relationship("User", back_populates="goals")
 
+    __table_args__ = (
+        # get_user_goals: WHERE user_id = ? ORDER BY id (keyset)
+        Index("ix_goals_user_id_id", "user_id", "id"),
+        # date ranges and the month calendar: WHERE user_id = ? AND date BETWEEN ...
+        Index("ix_goals_user_date", "user_id", "date"),
+    )
+
 
 class SessionStatus(str, enum.Enum):
     created = "created"     # saved but not started
@@ -59,12 +65,54 @@ class FocusSession(Base):
     status = Column(Enum(SessionStatus), default=SessionStatus.created, nullable=False)
 
     started_at = Column(DateTime, nullable=True)
+    resumed_at = Column(DateTime, nullable=True)          # start of the current running stretch
     completed_at = Column(DateTime, nullable=True)
     updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
 
     # final growth score for this session (0, 0.5, 1) set at completion
     plant_growth = Column(Float, default=0.0) 
 
+    __table_args__ = (
+        # list_sessions / daily_summary: WHERE user_id = ? AND started_at range
+        Index("ix_focus_sessions_user_started", "user_id", "started_at", "id"),
+        # active-session rebuild / summary active timer: only the few running rows are indexed
+        Index(
+            "ix_focus_sessions_running",
+            "user_id", "updated_at",
+            postgresql_where=(status == SessionStatus.running),
+            sqlite_where=(status == SessionStatus.running),
+        ),
+    )
+
+
+class FocusDailyStats(Base):
+    """Per-user daily rollup of focus sessions, keyed by the day they started.
+
+    Kept in step by the focus router on pause/complete; rebuild with
+    `python -m backend.focusStats rebuild` after backfills.
+    """
+    __tablename__ = "focus_daily_stats"
+
+    user_id = Column(Integer, primary_key=True)           # 0 = sessions without a user
+    day = Column(Date, primary_key=True, index=True)
+    total_elapsed_sec = Column(Float, nullable=False, default=0.0)
+    completed_count = Column(Integer, nullable=False, default=0)
+    growth_sum = Column(Float, nullable=False, default=0.0)   # sum of plant_growth over completed sessions
+
+
+class FocusScore(Base):
+    """Leaderboard score: completed focus seconds per user and scope.
+
+    scope_id 0 is the global board; any other value is a challenge id, and
+    counts sessions completed while the user was a member. Kept in step by
+    complete_session and mirrored in memory by backend.leaderboard.
+    """
+    __tablename__ = "focus_scores"
+
+    scope_id = Column(Integer, primary_key=True)
+    user_id = Column(Integer, primary_key=True)
+    total_sec = Column(Float, nullable=False, default=0.0)
+
 
 
 # (Challenge Table)
@@ -78,31 +126,88 @@ class Challenge(Base):
     creator_name = Column(String, nullable=False)
     start_date = Column(String, nullable=True)
     end_date = Column(String, nullable=True)
-    participants = Column(JSON, default=[])
-    #participants = Column(Integer, default=0)
+    # membership and per-user progress live in challenge_participants;
+    # participant_count is kept in step so joins can be capped atomically
+    participant_count = Column(Integer, nullable=False, default=0)
     max_participants = Column(Integer, nullable=False, default=10)
-    tasks = Column(JSON, default=[])
-    progress = Column(JSON, default=dict)
-    group_progress = Column(Integer, default=0)
+    # running sum of member progress; group_progress = progress_sum / participant_count
+    progress_sum = Column(Float, nullable=False, default=0.0)
+    group_progress = Column(Float, default=0)
     creator_id = Column(Integer, ForeignKey("users.id"))
     creator = relationship("User", back_populates="challenges_created")
 
+    __table_args__ = (
+        # get_challenges filters, keyset on id
+        Index("ix_challenges_level_id", "level", "id"),
+        Index("ix_challenges_creator_id_id", "creator_id", "id"),
+    )
+
     tasks = relationship(
         "ChallengeTask",
         back_populates="challenge",
         cascade="all, delete-orphan",
-        lazy="joined",    
+        lazy="selectin",    # one IN query per page, no row-per-task join
+        order_by="ChallengeTask.id",
+    )
+
+    members = relationship(
+        "ChallengeParticipant",
+        back_populates="challenge",
+        cascade="all, delete-orphan",
+        passive_deletes=True,
+        lazy="selectin",
+        order_by="ChallengeParticipant.joined_at",
     )
 
+    @property
+    def participants(self) -> list[int]:
+        return [m.user_id for m in self.members]
+
+    @property
+    def progress(self) -> dict[str, float]:
+        return {str(m.user_id): m.progress for m in self.members}
+
 
 class ChallengeTask(Base):
     __tablename__ = "challenge_tasks"
 
     id = Column(Integer, primary_key=True, index=True)
-    challenge_id = Column(Integer, ForeignKey("challenges.id", ondelete="CASCADE"))
+    challenge_id = Column(Integer, ForeignKey("challenges.id", ondelete="CASCADE"), index=True)
     title = Column(String, nullable=False)
     done = Column(Boolean, default=False)
 
     challenge = relationship("Challenge", back_populates="tasks")
 
-   
\ No newline at end of file
+
+class ChallengeParticipant(Base):
+    """One row per (challenge, user): membership plus that user's task progress."""
+    __tablename__ = "challenge_participants"
+
+    challenge_id = Column(Integer, ForeignKey("challenges.id", ondelete="CASCADE"), primary_key=True)
+    user_id = Column(Integer, primary_key=True)
+    progress = Column(Float, nullable=False, default=0.0)
+    joined_at = Column(DateTime, default=datetime.utcnow)
+
+    challenge = relationship("Challenge", back_populates="members")
+
+    __table_args__ = (
+        # "challenges I joined": WHERE user_id = ? ORDER BY challenge_id
+        Index("ix_challenge_participants_user_id", "user_id", "challenge_id"),
+    )
+
+
+class Comment(Base):
+    __tablename__ = "comments"
+
+    id = Column(Integer, primary_key=True, index=True)
+    challenge_id = Column(Integer, ForeignKey("challenges.id", ondelete="CASCADE"), nullable=False)
+    user_id = Column(Integer, nullable=False)
+    user_name = Column(String, nullable=False)
+    content = Column(Text, nullable=False)
+    created_at = Column(DateTime, nullable=False, default=datetime.utcnow)
+    updated_at = Column(DateTime, nullable=True)
+
+    __table_args__ = (
+        # get_comments: WHERE challenge_id = ? ORDER BY created_at, id (keyset)
+        Index("ix_comments_challenge_created", "challenge_id", "created_at", "id"),
+    )
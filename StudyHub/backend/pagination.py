@@ -0,0 +1,80 @@
+import base64
+import json
+from datetime import datetime
+
+from fastapi import HTTPException, Query, Response
+
+# ============================================================
+# Keyset (cursor) pagination helpers
+# ============================================================
+# List endpoints keep returning a plain JSON array so existing clients
+# work unchanged; the cursor for the next page travels in a header.
+# Endpoints the shipped frontend calls without paging take
+# `limit_param(None)`: with neither limit nor cursor they still return
+# every row, as before pagination existed (see page_limit).
+DEFAULT_PAGE_LIMIT = 100
+MAX_PAGE_LIMIT = 500
+NEXT_CURSOR_HEADER = "X-Next-Cursor"
+
+
+def limit_param(default: int = DEFAULT_PAGE_LIMIT):
+    return Query(default, ge=1, le=MAX_PAGE_LIMIT, description="Page size")
+
+
+def page_limit(limit: int | None, cursor: str | None) -> int | None:
+    """Page size for a `limit_param(None)` endpoint; None means unbounded."""
+    if limit is None and cursor:
+        return DEFAULT_PAGE_LIMIT
+    return limit
+
+
+def fetch_limit(limit: int | None) -> int | None:
+    """Rows to fetch so paginate() can tell whether another page follows."""
+    return None if limit is None else limit + 1
+
+
+def cursor_param():
+    return Query(None, description=f"Opaque cursor from the previous page's {NEXT_CURSOR_HEADER} header")
+
+
+def encode_cursor(*values) -> str:
+    raw = json.dumps([v.isoformat() if isinstance(v, datetime) else v for v in values])
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str, *types) -> list:
+    """Values of an encode_cursor() cursor, one per entry of `types` (a
+    type or tuple of types each); anything else is a 400, never a bad bind."""
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        values = json.loads(base64.urlsafe_b64decode(padded.encode()))
+    except (ValueError, TypeError):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    if (
+        not isinstance(values, list)
+        or len(values) != len(types)
+        or not all(isinstance(v, t) and not isinstance(v, bool) for v, t in zip(values, types))
+    ):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    return values
+
+
+def parse_cursor_datetime(value) -> datetime | None:
+    if value is None:
+        return None
+    try:
+        return datetime.fromisoformat(value)
+    except (TypeError, ValueError):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+
+def paginate(rows: list, limit: int | None, response: Response, key) -> list:
+    """Trim a `limit + 1` fetch to `limit` rows and set the next-page header.
+
+    `key(row)` returns the tuple the next page should continue after; with
+    limit None the rows are returned as they are.
+    """
+    if limit is not None and len(rows) > limit:
+        rows = rows[:limit]
+        response.headers[NEXT_CURSOR_HEADER] = encode_cursor(*key(rows[-1]))
+    return rows
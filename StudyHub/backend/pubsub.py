@@ -0,0 +1,126 @@
+"""Publish/subscribe fan-out for live updates.
+
+Handlers publish small event dicts to a topic after they commit; streaming
+endpoints subscribe to a topic and forward what arrives. `Broker` is the
+interface; `InMemoryBroker` fans out inside one process and is the
+default. Swap it with `set_broker()` (e.g. a stand-in in tests, or a
+Redis-backed broker when running several workers).
+
+A subscriber is just a bounded asyncio.Queue bound to its event loop, so
+thousands of idle subscribers cost a few KB each and no threads.
+"""
+import abc
+import asyncio
+import os
+from contextlib import asynccontextmanager
+from threading import Lock
+
+# ============================================================
+# Settings
+# ============================================================
+SUBSCRIBER_QUEUE_SIZE = int(os.getenv("PUBSUB_QUEUE_SIZE", "64"))        # events buffered per subscriber
+MAX_SUBSCRIBERS = int(os.getenv("PUBSUB_MAX_SUBSCRIBERS", "10000"))     # per process
+
+
+class TooManySubscribers(Exception):
+    """Raised when MAX_SUBSCRIBERS streams are already open."""
+
+
+class Subscription:
+    def __init__(self, topic: str, loop: asyncio.AbstractEventLoop, maxsize: int):
+        self.topic = topic
+        self.loop = loop
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize)
+        self.dropped = 0
+
+    def offer(self, event: dict):
+        """Enqueue on the subscriber's loop; a slow reader loses its oldest events."""
+        if self.queue.full():
+            self.queue.get_nowait()
+            self.dropped += 1
+        self.queue.put_nowait(event)
+
+    async def get(self, timeout: float | None = None) -> dict | None:
+        """Next event, or None after `timeout` seconds without one."""
+        try:
+            return await asyncio.wait_for(self.queue.get(), timeout)
+        except asyncio.TimeoutError:
+            return None
+
+
+class Broker(abc.ABC):
+    @abc.abstractmethod
+    def publish(self, topic: str, event: dict) -> None:
+        ...
+
+    @abc.abstractmethod
+    def subscribe(self, topic: str):
+        """Async context manager yielding a Subscription."""
+
+    def snapshot(self) -> dict:
+        return {}
+
+
+class InMemoryBroker(Broker):
+    def __init__(self, queue_size: int = SUBSCRIBER_QUEUE_SIZE, max_subscribers: int = MAX_SUBSCRIBERS):
+        self.queue_size = queue_size
+        self.max_subscribers = max_subscribers
+        self._lock = Lock()
+        self._topics: dict[str, set[Subscription]] = {}
+        self._count = 0
+        self.published = 0
+        self.delivered = 0
+
+    def publish(self, topic: str, event: dict) -> None:
+        """Safe to call from sync handlers running in the threadpool."""
+        with self._lock:
+            subscribers = list(self._topics.get(topic, ()))
+            self.published += 1
+            self.delivered += len(subscribers)
+        for sub in subscribers:
+            try:
+                sub.loop.call_soon_threadsafe(sub.offer, event)
+            except RuntimeError:
+                pass  # subscriber's loop already closed; it unsubscribes itself
+
+    @asynccontextmanager
+    async def subscribe(self, topic: str):
+        sub = Subscription(topic, asyncio.get_running_loop(), self.queue_size)
+        with self._lock:
+            if self._count >= self.max_subscribers:
+                raise TooManySubscribers()
+            self._topics.setdefault(topic, set()).add(sub)
+            self._count += 1
+        try:
+            yield sub
+        finally:
+            with self._lock:
+                subs = self._topics.get(topic)
+                subs.discard(sub)
+                if not subs:
+                    del self._topics[topic]
+                self._count -= 1
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            return {
+                "topics": len(self._topics),
+                "subscribers": self._count,
+                "max_subscribers": self.max_subscribers,
+                "published": self.published,
+                "delivered": self.delivered,
+            }
+
+
+_broker: Broker = InMemoryBroker()
+
+
+def get_broker() -> Broker:
+    return _broker
+
+
+def set_broker(broker: Broker) -> Broker:
+    """Install a different broker (returns the previous one)."""
+    global _broker
+    previous, _broker = _broker, broker
+    return previous
@@ -1,6 +1,6 @@
 from pydantic import BaseModel, Field
 from typing import Optional, Literal
-from datetime import datetime
+from datetime import date, datetime
 from typing import Optional, List, Dict, Any
 
 
@@ -24,7 +24,7 @@ class UserResponse(BaseModel):
 class GoalBase(BaseModel):
     title: str
     completed: bool = False
-    date: str
+    date: date                  # YYYY-MM-DD
     user_id: int
     color: Optional[str] = None
 
@@ -42,6 +42,52 @@ class GoalResponse(GoalBase):
         orm_mode = True
 
 
+class GoalCalendarDay(BaseModel):
+    date: date
+    total: int
+    completed: int
+
+
+class GoalCalendar(BaseModel):
+    user_id: int
+    year: int
+    month: int
+    total: int
+    completed: int
+    days: List[GoalCalendarDay]     # every day of the month, zero-filled
+
+
+# Batch goal operations: one user, up to MAX_GOAL_BATCH items, one transaction
+MAX_GOAL_BATCH = 500
+
+
+class GoalBatchItem(BaseModel):
+    title: str
+    completed: bool = False
+    date: date
+    color: Optional[str] = None
+
+
+class GoalBatchCreate(BaseModel):
+    user_id: int
+    goals: List[GoalBatchItem] = Field(min_length=1, max_length=MAX_GOAL_BATCH)
+
+
+class GoalBatchIds(BaseModel):
+    user_id: int
+    ids: List[int] = Field(min_length=1, max_length=MAX_GOAL_BATCH)
+
+
+class GoalBatchResult(BaseModel):
+    id: Optional[int] = None
+    status: Literal["created", "toggled", "deleted", "not_found"]
+    goal: Optional[GoalResponse] = None
+
+
+class GoalBatchResponse(BaseModel):
+    results: List[GoalBatchResult]
+
+
 class FocusCreate(BaseModel):
     title: str
     duration_min: int
@@ -65,8 +111,12 @@ class FocusResponse(BaseModel):
         from_attributes = True
 
 class FocusTick(BaseModel):
-    """Sent by client only when pausing or completing, to sync elapsed time."""
-    elapsed_sec: float = Field(ge=0)
+    """Optional client elapsed time on pause/complete.
+
+    The server derives elapsed time from resumed_at; the client value is
+    only used for sessions that were running before resumed_at existed.
+    """
+    elapsed_sec: Optional[float] = Field(None, ge=0)
 
 class FocusSummary(BaseModel):
     date: str
@@ -74,6 +124,41 @@ class FocusSummary(BaseModel):
     active_timer: Optional[int] = None       # remaining seconds for the latest running session (if any)
     daily_plant_growth: float                      
 
+class FocusPeriod(BaseModel):
+    period: str                 # first day of the bucket, YYYY-MM-DD
+    sessions: int
+    completed: int
+    total_elapsed_sec: float
+    completion_rate: float      # completed / sessions
+    avg_plant_growth: float     # over completed sessions
+
+class FocusAnalytics(BaseModel):
+    granularity: Literal["day", "week", "month"]
+    date_from: str
+    date_to: str
+    series: List[FocusPeriod]
+    totals: FocusPeriod         # period = date_from
+    current_streak: int         # consecutive days with a completed session
+    longest_streak: int
+
+class LeaderboardEntry(BaseModel):
+    rank: int                   # tied scores share a rank
+    user_id: int
+    name: Optional[str] = None
+    total_sec: float
+
+class LeaderboardRank(BaseModel):
+    user_id: int
+    challenge_id: Optional[int] = None
+    rank: Optional[int] = None  # None when the user has no completed session on the board
+    total_sec: float = 0.0
+    board_size: int
+
+class ImportSummary(BaseModel):
+    lines: int
+    imported: Dict[str, int]    # rows written, per record type
+    skipped: Dict[str, int]     # already present, or their user/challenge does not exist
+
 # (Request Body)
 
 class ChallengeTaskOut(BaseModel):
@@ -123,6 +208,25 @@ class ChallengeResponse(BaseModel):
         from_attributes = True
         orm_mode = True
     
+# Card view for the challenge list (?view=summary): no tasks/members payload
+class ChallengeSummary(BaseModel):
+    id: int
+    title: str
+    description: Optional[str]
+    level: Optional[str]
+    creator_name: str
+    creator_id: Optional[int] = None
+    start_date: Optional[str]
+    end_date: Optional[str]
+    max_participants: int
+    group_progress: float = 0.0
+    participants_count: int
+    tasks_count: int
+
+    class Config:
+        from_attributes = True
+
+
 class ChallengeJoin(BaseModel):
     user_id: int
 
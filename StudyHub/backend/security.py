@@ -0,0 +1,129 @@
+import asyncio
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from threading import Lock
+
+# ============================================================
+# Settings
+# ============================================================
+BCRYPT_ROUNDS = int(os.getenv("BCRYPT_ROUNDS", "12"))
+HASH_WORKERS = int(os.getenv("HASH_WORKERS", str(min(4, os.cpu_count() or 1))))
+HASH_MAX_QUEUE = int(os.getenv("HASH_MAX_QUEUE", "64"))   # waiting + running hashes
+
+# Password hashing. passlib and the bcrypt backend are imported on first
+# use (or by preload() once the app is ready), off the cold-start path.
+_pwd_context = None
+_pwd_context_lock = Lock()
+
+
+def pwd_context():
+    global _pwd_context
+    if _pwd_context is None:
+        with _pwd_context_lock:
+            if _pwd_context is None:
+                from passlib.context import CryptContext
+
+                # min == max rounds: needs_update() flags hashes made under any other cost
+                _pwd_context = CryptContext(
+                    schemes=["bcrypt"],
+                    deprecated="auto",
+                    bcrypt__rounds=BCRYPT_ROUNDS,
+                    bcrypt__min_rounds=BCRYPT_ROUNDS,
+                    bcrypt__max_rounds=BCRYPT_ROUNDS,
+                )
+    return _pwd_context
+
+
+def preload():
+    """Import passlib and load the bcrypt backend ahead of the first sign-in."""
+    pwd_context().handler("bcrypt").get_backend()
+
+# bcrypt releases the GIL, so a small thread pool keeps hashing off the
+# event loop without the pickling cost of a process pool.
+_executor = ThreadPoolExecutor(max_workers=HASH_WORKERS, thread_name_prefix="bcrypt")
+
+
+class HashQueueFull(Exception):
+    """Raised when HASH_MAX_QUEUE hashes are already waiting or running."""
+
+
+class HashStats:
+    def __init__(self):
+        self._lock = Lock()
+        self.pending = 0      # admitted, not finished
+        self.running = 0      # currently on a worker thread
+        self.completed = 0
+        self.rejected = 0
+        self.rehashed = 0
+        self.hash_total_sec = 0.0
+        self.hash_max_sec = 0.0
+        self.wait_total_sec = 0.0
+
+    def admit(self):
+        with self._lock:
+            if self.pending >= HASH_MAX_QUEUE:
+                self.rejected += 1
+                raise HashQueueFull()
+            self.pending += 1
+
+    def incr(self, name: str):
+        with self._lock:
+            setattr(self, name, getattr(self, name) + 1)
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            done = self.completed or 1
+            return {
+                "workers": HASH_WORKERS,
+                "bcrypt_rounds": BCRYPT_ROUNDS,
+                "max_queue": HASH_MAX_QUEUE,
+                "queue_depth": self.pending - self.running,
+                "running": self.running,
+                "completed": self.completed,
+                "rejected": self.rejected,
+                "rehashed": self.rehashed,
+                "hash_avg_ms": round(self.hash_total_sec / done * 1000, 3),
+                "hash_max_ms": round(self.hash_max_sec * 1000, 3),
+                "queue_wait_avg_ms": round(self.wait_total_sec / done * 1000, 3),
+            }
+
+
+hash_stats = HashStats()
+
+
+def _timed(fn, args, submitted: float):
+    started = time.perf_counter()
+    with hash_stats._lock:
+        hash_stats.running += 1
+        hash_stats.wait_total_sec += started - submitted
+    try:
+        return fn(*args)
+    finally:
+        spent = time.perf_counter() - started
+        with hash_stats._lock:
+            hash_stats.running -= 1
+            hash_stats.completed += 1
+            hash_stats.hash_total_sec += spent
+            hash_stats.hash_max_sec = max(hash_stats.hash_max_sec, spent)
+
+
+async def _offload(fn, *args):
+    hash_stats.admit()
+    try:
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(_executor, _timed, fn, args, time.perf_counter())
+    finally:
+        with hash_stats._lock:
+            hash_stats.pending -= 1
+
+
+# ============================================================
+# Public helpers
+# ============================================================
+async def hash_password(password: str) -> str:
+    return await _offload(lambda: pwd_context().hash(password))
+
+
+async def verify_password(password: str, hashed: str) -> bool:
+    return await _offload(lambda: pwd_context().verify(password, hashed))
@@ -0,0 +1,61 @@
+"""Fast JSON paths for large list responses.
+
+The default FastAPI path validates every ORM instance against the
+response_model, converts it to a dict, and runs the stdlib JSON encoder.
+For long histories, that per-object work dominates the request. Two cheaper paths:
+
+- `RowSerializer`: select only the response columns as row tuples and
+  dump them with a prebuilt TypeAdapter over a TypedDict that mirrors the
+  response model. Serialization runs in pydantic-core; there is no
+  validation and no ORM identity map. The bytes are identical to the
+  response_model output.
+- `fastapi.responses.ORJSONResponse` for routes that build plain dicts.
+
+Routes opt in by name through FAST_JSON_ROUTES (comma-separated, "none"
+to disable), so a route can fall back to response_model without a deploy.
+get_challenges needs no switch: its pages are already served as cached,
+pre-serialized bytes, and its summary view always uses a RowSerializer.
+"""
+import os
+
+from fastapi import Response
+from pydantic import TypeAdapter
+from typing_extensions import TypedDict
+
+FAST_JSON_ROUTES = {
+    name.strip()
+    for name in os.getenv("FAST_JSON_ROUTES", "list_sessions,get_user_goals").split(",")
+    if name.strip() and name.strip() != "none"
+}
+
+
+def fast_json(route_name: str) -> bool:
+    return route_name in FAST_JSON_ROUTES
+
+
+class RowSerializer:
+    """Serialize `select(*serializer.columns)` rows as a list of `model`.
+
+    `columns` are the table columns named like the model's fields, in
+    field order, so each row zips straight into a dict.
+    """
+
+    def __init__(self, model, table, **extra_columns):
+        self.fields = list(model.model_fields)
+        self.columns = [extra_columns.get(name, table.c.get(name)) for name in self.fields]
+        missing = [name for name, col in zip(self.fields, self.columns) if col is None]
+        assert not missing, f"{model.__name__}: no column for {missing}"
+        row_type = TypedDict(
+            f"{model.__name__}Row", {name: f.annotation for name, f in model.model_fields.items()}
+        )
+        self._adapter = TypeAdapter(list[row_type])
+
+    def dump(self, rows) -> bytes:
+        fields = self.fields
+        return self._adapter.dump_json([dict(zip(fields, row)) for row in rows])
+
+    def response(self, rows, response: Response | None = None) -> Response:
+        """JSON response for `rows`, carrying headers set on `response` (e.g. the next cursor)."""
+        headers = dict(response.headers) if response is not None else {}
+        headers.pop("content-length", None)
+        return Response(content=self.dump(rows), media_type="application/json", headers=headers)
@@ -0,0 +1,147 @@
+"""Startup modes, connection-pool pre-warming and readiness.
+
+STARTUP_MODE=development (the default) keeps the local workflow: pending
+migrations are applied on boot and the route table is printed. Without
+DATABASE_URL, backend.database only falls back to the local SQLite file
+when STARTUP_MODE=development is set explicitly.
+
+STARTUP_MODE=production is for cold-started workers. Boot does no DDL and
+no catalog inspection: one query checks that the database is already at
+this build's migration version (run `python -m backend.migrations` as a
+release step), and the worker refuses to start otherwise. passlib/bcrypt
+are not imported until they are needed.
+
+In both modes the pools are pre-warmed in the background (POOL_PREWARM
+connections per engine, opened concurrently) and passlib is preloaded;
+GET /ready answers 503 until that is done and again once shutdown begins.
+
+Import time, startup time and time-to-first-response (all measured from
+the moment main.py starts importing) are exposed on /api/metrics/startup.
+"""
+import asyncio
+import logging
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+IMPORT_STARTED = time.perf_counter()   # main.py imports this module first
+
+from .metrics import registry
+
+logger = logging.getLogger("studyhub.startup")
+
+# ============================================================
+# Settings
+# ============================================================
+STARTUP_MODE = os.getenv("STARTUP_MODE", "development")
+PRODUCTION = STARTUP_MODE == "production"
+POOL_PREWARM = int(os.getenv("POOL_PREWARM", "2"))   # connections opened per engine at startup
+
+
+class SchemaOutOfDate(RuntimeError):
+    """The database is behind this build's latest migration."""
+
+
+class StartupState:
+    def __init__(self):
+        self.ready = False
+        self.status = "starting"
+        self.schema_version = None
+        self.import_sec = None
+        self.startup_sec = None
+        self.warmup_sec = None
+        self.prewarmed_sync = 0
+        self.prewarmed_async = 0
+
+    def imported(self):
+        self.import_sec = time.perf_counter() - IMPORT_STARTED
+
+    def snapshot(self) -> dict:
+        first = registry.first_response_at
+        return {
+            "mode": STARTUP_MODE,
+            "ready": self.ready,
+            "status": self.status,
+            "schema_version": self.schema_version,
+            "import_sec": _round(self.import_sec),
+            "startup_sec": _round(self.startup_sec),
+            "warmup_sec": _round(self.warmup_sec),
+            "first_response_sec": _round(first - IMPORT_STARTED if first is not None else None),
+            "prewarmed_sync": self.prewarmed_sync,
+            "prewarmed_async": self.prewarmed_async,
+        }
+
+
+def _round(seconds):
+    return round(seconds, 4) if seconds is not None else None
+
+
+state = StartupState()
+
+
+# ============================================================
+# Schema
+# ============================================================
+def check_schema(engine) -> int:
+    """Version check instead of DDL; raises SchemaOutOfDate if behind."""
+    from .migrations import LATEST_VERSION, current_version
+
+    with engine.connect() as conn:
+        version = current_version(conn)
+    if version < LATEST_VERSION:
+        raise SchemaOutOfDate(
+            f"database schema is at version {version}, this build needs {LATEST_VERSION}; "
+            "run `python -m backend.migrations` before starting in production mode"
+        )
+    return version
+
+
+# ============================================================
+# Pool pre-warming
+# ============================================================
+def _prewarm_sync(engine, count: int) -> int:
+    # every connection stays checked out until all are open, otherwise the
+    # pool would hand the first one back over and over
+    with ThreadPoolExecutor(max_workers=count, thread_name_prefix="prewarm") as pool:
+        futures = [pool.submit(engine.raw_connection) for _ in range(count)]
+    opened = []
+    for future in futures:
+        try:
+            opened.append(future.result())
+        except Exception as exc:
+            logger.warning("pool prewarm (sync) failed: %s", exc)
+    for conn in opened:
+        conn.close()
+    return len(opened)
+
+
+async def _prewarm_async(engine, count: int) -> int:
+    results = await asyncio.gather(*(engine.connect() for _ in range(count)), return_exceptions=True)
+    opened = [conn for conn in results if not isinstance(conn, BaseException)]
+    for exc in results:
+        if isinstance(exc, BaseException):
+            logger.warning("pool prewarm (async) failed: %s", exc)
+    for conn in opened:
+        await conn.close()
+    return len(opened)
+
+
+async def warm_up(engine, async_engine, count: int = POOL_PREWARM):
+    """Open `count` connections on both pools concurrently, preload passlib,
+    then mark the process ready."""
+    from .security import preload
+
+    started = time.perf_counter()
+    try:
+        if count > 0:
+            state.prewarmed_sync, state.prewarmed_async = await asyncio.gather(
+                asyncio.to_thread(_prewarm_sync, engine, count),
+                _prewarm_async(async_engine, count),
+            )
+        await asyncio.to_thread(preload)
+    except Exception:
+        logger.exception("warm-up failed; serving with cold pools")
+    state.warmup_sec = time.perf_counter() - started
+    if state.status == "warming":
+        state.ready = True
+        state.status = "ready"
@@ -0,0 +1,139 @@
+"""Stateless signed session tokens.
+
+`login` issues `<user_id>.<expires>.<signature>`, where the signature is an
+HMAC-SHA256 of the first two parts under TOKEN_SECRET. Verifying one is
+pure computation with no database lookup, and recently verified tokens sit
+in a small LRU so repeat requests skip even the HMAC.
+
+Tokens are optional for now: the frontend still sends user_id. Routes take
+`token_user_id` (None without an Authorization header, 401 for a bad or
+expired token) and trust it over, and instead of looking up, the user id
+in the request.
+"""
+import base64
+import hashlib
+import hmac
+import logging
+import os
+import secrets
+import time
+from collections import OrderedDict
+from threading import Lock
+
+from fastapi import Header, HTTPException
+
+logger = logging.getLogger("studyhub.tokens")
+
+# ============================================================
+# Settings
+# ============================================================
+TOKEN_SECRET = os.getenv("TOKEN_SECRET", "")
+TOKEN_TTL_SEC = int(os.getenv("TOKEN_TTL_SEC", str(7 * 24 * 3600)))
+TOKEN_CACHE_SIZE = int(os.getenv("TOKEN_CACHE_SIZE", "4096"))   # verified tokens kept in memory
+
+if TOKEN_SECRET:
+    _key = TOKEN_SECRET.encode()
+else:
+    # tokens then only verify on this process and until it restarts
+    _key = secrets.token_bytes(32)
+    logger.warning("TOKEN_SECRET is not set; using a random per-process key")
+
+
+class InvalidToken(Exception):
+    pass
+
+
+def _sign(message: bytes) -> str:
+    digest = hmac.new(_key, message, hashlib.sha256).digest()
+    return base64.urlsafe_b64encode(digest).rstrip(b"=").decode()
+
+
+def issue_token(user_id: int, ttl: int = TOKEN_TTL_SEC) -> tuple[str, int]:
+    """(token, expires_at unix seconds)"""
+    expires = int(time.time()) + ttl
+    message = f"{user_id}.{expires}"
+    return f"{message}.{_sign(message.encode())}", expires
+
+
+class TokenVerifier:
+    def __init__(self, max_entries: int = TOKEN_CACHE_SIZE):
+        self.max_entries = max_entries
+        self._lock = Lock()
+        self._verified: OrderedDict[str, tuple[int, int]] = OrderedDict()   # token -> (user_id, expires)
+        self.hits = 0
+        self.misses = 0
+        self.rejected = 0
+
+    def verify(self, token: str) -> int:
+        """User id of a valid, unexpired token; raises InvalidToken."""
+        now = time.time()
+        with self._lock:
+            entry = self._verified.get(token)
+            if entry is not None:
+                if entry[1] > now:
+                    self._verified.move_to_end(token)
+                    self.hits += 1
+                    return entry[0]
+                del self._verified[token]
+            self.misses += 1
+        try:
+            user_id, expires = self._check(token, now)
+        except InvalidToken:
+            with self._lock:
+                self.rejected += 1
+            raise
+        with self._lock:
+            self._verified[token] = (user_id, expires)
+            if len(self._verified) > self.max_entries:
+                self._verified.popitem(last=False)
+        return user_id
+
+    @staticmethod
+    def _check(token: str, now: float) -> tuple[int, int]:
+        message, _, signature = token.rpartition(".")
+        user_id, _, expires = message.partition(".")
+        if not (user_id.isdigit() and expires.isdigit() and signature):
+            raise InvalidToken("malformed token")
+        if not hmac.compare_digest(signature, _sign(message.encode())):
+            raise InvalidToken("bad signature")
+        if int(expires) <= now:
+            raise InvalidToken("token expired")
+        return int(user_id), int(expires)
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._verified),
+                "max_entries": self.max_entries,
+                "hits": self.hits,
+                "misses": self.misses,
+                "rejected": self.rejected,
+                "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+                "ttl_sec": TOKEN_TTL_SEC,
+            }
+
+
+verifier = TokenVerifier()
+
+
+# ============================================================
+# Dependencies
+# ============================================================
+def token_user_id(authorization: str | None = Header(None)) -> int | None:
+    """Trusted user id from `Authorization: Bearer <token>`, or None if absent."""
+    if authorization is None:
+        return None
+    scheme, _, token = authorization.partition(" ")
+    if scheme.lower() != "bearer" or not token:
+        raise HTTPException(status_code=401, detail="Expected a Bearer token", headers={"WWW-Authenticate": "Bearer"})
+    try:
+        return verifier.verify(token.strip())
+    except InvalidToken as exc:
+        raise HTTPException(status_code=401, detail=str(exc), headers={"WWW-Authenticate": "Bearer"})
+
+
+def check_token_user(token_user: int | None, user_id: int):
+    """403 when a token is present but speaks for a different user."""
+    if token_user is not None and token_user != user_id:
+        raise HTTPException(status_code=403, detail="Token does not match user_id")
@@ -0,0 +1,407 @@
+"""Streaming NDJSON export and bulk import of a user's data.
+
+One JSON object per line. The first line describes the export, and every
+other line is one row tagged with its kind:
+
+    {"type": "export", "version": 1, "user_id": 7, "exported_at": "..."}
+    {"type": "focus_session", "id": 12, "user_id": 7, "title": "...", ...}
+    {"type": "goal", "id": 3, "user_id": 7, "date": "2025-01-01", ...}
+    {"type": "challenge_membership", "challenge_id": 2, "user_id": 7, ...}
+
+Export reads through a server-side cursor (`yield_per`, a named cursor on
+Postgres). It writes EXPORT_BATCH rows per chunk, so memory stays flat
+however long the history is.
+
+Import buffers at most IMPORT_BATCH rows per kind. It writes each full
+buffer as one executemany INSERT (multi-row VALUES via insertmanyvalues).
+The whole file is a single transaction:
+
+- Every record is validated against the column types of its table.
+- Focus session and goal ids are reassigned. A row whose natural key
+  (user, started_at, title for sessions; user, date, title for goals)
+  already existed before the import is skipped, so importing the same
+  export twice adds nothing. Duplicates inside one file are kept.
+- Memberships keep their natural key and skip rows that already exist.
+  Without joined_at they join at import time (it scopes challenge scores).
+- Rows that point at a missing user or challenge are skipped and counted.
+- Challenge counters, and the focus_daily_stats days and focus_scores of
+  the imported users, are recomputed before commit.
+- Membership caps (max_participants) are not enforced, as in migration 3.
+
+    python -m backend.transfer export 7 -o user7.ndjson
+    python -m backend.transfer import user7.ndjson [--user-id 9]
+
+A CLI import does not reach the in-memory leaderboards or active-session
+index of running workers; they pick it up on restart. The HTTP import
+endpoint reloads the imported user's entries.
+"""
+import argparse
+import json
+import os
+import sys
+from datetime import date, datetime
+from typing import Iterable, Iterator, Optional
+
+from pydantic import TypeAdapter, ValidationError
+from sqlalchemy import func, insert, or_, select, update
+from typing_extensions import TypedDict
+
+from .challenges import _group_average
+from .database import dialect_insert
+from .focusStats import rebuild_daily_stats
+from .leaderboard import recompute_scores
+from .models import Challenge, ChallengeParticipant, FocusSession, Goal, User
+
+try:
+    import orjson
+except ImportError:  # optional; falls back to the stdlib encoder
+    orjson = None
+
+# ============================================================
+# Settings
+# ============================================================
+EXPORT_BATCH = int(os.getenv("EXPORT_BATCH", "1000"))      # rows fetched per cursor round trip
+IMPORT_BATCH = int(os.getenv("IMPORT_BATCH", "1000"))      # rows per executemany INSERT
+IMPORT_MAX_BYTES = int(os.getenv("IMPORT_MAX_BYTES", str(256 * 1024 * 1024)))   # HTTP upload limit
+IMPORT_SPOOL_BYTES = 1024 * 1024    # uploads beyond this are spooled to a temp file
+
+FORMAT_VERSION = 1
+MEDIA_TYPE = "application/x-ndjson"
+
+KINDS = {
+    "focus_session": FocusSession.__table__,
+    "goal": Goal.__table__,
+    "challenge_membership": ChallengeParticipant.__table__,
+}
+
+# export order per kind, each served by an index on (user_id, ...)
+_EXPORT_ORDER = {
+    "focus_session": ("started_at", "id"),
+    "goal": ("id",),
+    "challenge_membership": ("challenge_id",),
+}
+
+_SURROGATE_KEYS = {"focus_session": "id", "goal": "id"}   # reassigned on import
+# re-import detection; the second column is indexed together with user_id
+_NATURAL_KEYS = {"focus_session": ("user_id", "started_at", "title"), "goal": ("user_id", "date", "title")}
+
+
+class InvalidRecord(ValueError):
+    """A line that is not a valid record; the import is rolled back."""
+
+
+# ============================================================
+# Export
+# ============================================================
+def _iso(value):
+    if isinstance(value, (date, datetime)):
+        return value.isoformat()
+    raise TypeError(f"{type(value).__name__} is not JSON serializable")
+
+
+def _dumps(record: dict) -> bytes:
+    if orjson is not None:
+        return orjson.dumps(record, option=orjson.OPT_APPEND_NEWLINE)
+    return json.dumps(record, default=_iso, separators=(",", ":")).encode() + b"\n"
+
+
+def export_user(conn, user_id: int, kinds: Iterable[str] = KINDS) -> Iterator[bytes]:
+    """NDJSON chunks of up to EXPORT_BATCH rows each, header first."""
+    yield _dumps({
+        "type": "export",
+        "version": FORMAT_VERSION,
+        "user_id": user_id,
+        "exported_at": datetime.utcnow().isoformat(),
+    })
+    for kind in kinds:
+        table = KINDS[kind]
+        result = conn.execute(
+            select(table)
+            .where(table.c.user_id == user_id)
+            .order_by(*(table.c[name] for name in _EXPORT_ORDER[kind]))
+            .execution_options(yield_per=EXPORT_BATCH)
+        )
+        for rows in result.partitions():
+            yield b"".join(_dumps({"type": kind, **row._mapping}) for row in rows)
+
+
+def stream_export(engine, user_id: int, kinds: Iterable[str] = KINDS) -> Iterator[bytes]:
+    """export_user on its own connection, held until the last chunk is sent."""
+    with engine.connect() as conn:
+        yield from export_user(conn, user_id, kinds)
+
+
+# ============================================================
+# Import
+# ============================================================
+def _default(column) -> tuple[bool, object, object]:
+    """(required, value, factory) for a column a record leaves out; every
+    row of an executemany needs the same keys. A callable default (e.g.
+    joined_at) is the factory and also replaces an explicit null."""
+    if column.default is not None and column.default.is_callable:
+        return False, None, column.default.arg
+    if column.default is not None and column.default.is_scalar:
+        return False, column.default.arg, None
+    return not column.nullable, None, None
+
+
+def _row_adapter(kind: str, table) -> TypeAdapter:
+    """Validates and converts the columns a record carries; other keys are ignored."""
+    fields = {
+        column.name: Optional[column.type.python_type] if column.nullable else column.type.python_type
+        for column in table.columns
+        if column.name != _SURROGATE_KEYS.get(kind)
+    }
+    return TypeAdapter(TypedDict(f"{kind}_row", fields, total=False))
+
+
+_COLUMNS = {
+    kind: [
+        (column.name, *_default(column))
+        for column in table.columns
+        if column.name != _SURROGATE_KEYS.get(kind)
+    ]
+    for kind, table in KINDS.items()
+}
+_ROWS = {kind: _row_adapter(kind, table) for kind, table in KINDS.items()}
+
+_loads = orjson.loads if orjson is not None else json.loads
+
+
+class Importer:
+    """Feed NDJSON lines, then finish(); both run inside the caller's transaction.
+
+    user_id, when given, replaces the user of every row (moving one
+    user's history onto another account).
+    """
+
+    def __init__(self, user_id: int | None = None, batch_size: int = IMPORT_BATCH):
+        self.user_id = user_id
+        self.batch_size = batch_size
+        self.lines = 0
+        self.imported = dict.fromkeys(KINDS, 0)
+        self.skipped = dict.fromkeys(KINDS, 0)
+        self._pending: dict[str, list[dict]] = {kind: [] for kind in KINDS}
+        self._challenges: set[int] = set()        # memberships added, counters to recompute
+        self._users: set[int] = set()              # users whose daily stats and scores to recompute
+        self._id_floor: dict[str, int] = {}        # highest id per kind before this import
+        self._day_from: date | None = None         # focus_daily_stats days to recompute
+        self._day_to: date | None = None
+
+    def _parse(self, line) -> tuple[str, dict] | None:
+        try:
+            record = _loads(line)
+        except ValueError as exc:
+            raise InvalidRecord(f"line {self.lines}: not JSON ({exc})")
+        if not isinstance(record, dict):
+            raise InvalidRecord(f"line {self.lines}: expected an object")
+        kind = record.get("type")
+        if kind == "export":
+            if record.get("version") != FORMAT_VERSION:
+                raise InvalidRecord(f"line {self.lines}: unsupported export version {record.get('version')!r}")
+            return None
+        if kind not in KINDS:
+            raise InvalidRecord(f"line {self.lines}: unknown record type {kind!r}")
+
+        try:
+            row = _ROWS[kind].validate_python(record)
+        except ValidationError as exc:
+            error = exc.errors()[0]
+            field = ".".join(str(part) for part in error["loc"])
+            raise InvalidRecord(f"line {self.lines}: bad {kind}.{field} ({error['msg']})")
+        for name, required, default, factory in _COLUMNS[kind]:
+            if factory is not None and row.get(name) is None:
+                row[name] = factory(None)
+                continue
+            if name in row:
+                continue
+            if required and name != "user_id":
+                raise InvalidRecord(f"line {self.lines}: {kind} without {name}")
+            row[name] = default
+        if self.user_id is not None:
+            row["user_id"] = self.user_id
+        elif not isinstance(row.get("user_id"), int):
+            raise InvalidRecord(f"line {self.lines}: {kind} without a user_id")
+        return kind, row
+
+    def feed(self, conn, lines: Iterable[bytes | str]):
+        for line in lines:
+            self.lines += 1
+            if not line.strip():
+                continue
+            parsed = self._parse(line)
+            if parsed is None:
+                continue
+            kind, row = parsed
+            pending = self._pending[kind]
+            pending.append(row)
+            if len(pending) >= self.batch_size:
+                self._flush(conn, kind)
+
+    def finish(self, conn) -> dict:
+        """Write what is buffered and recompute derived tables; returns the summary."""
+        for kind in KINDS:
+            self._flush(conn, kind)
+        if self._challenges:
+            _recount_challenges(conn, self._challenges)
+        if self._day_from is not None:
+            rebuild_daily_stats(conn, self._day_from, self._day_to, commit=False, user_ids=self._users)
+        if self._users:
+            recompute_scores(conn, user_ids=self._users)
+        return self.summary()
+
+    def summary(self) -> dict:
+        return {"lines": self.lines, "imported": dict(self.imported), "skipped": dict(self.skipped)}
+
+    def _flush(self, conn, kind: str):
+        rows = self._pending[kind]
+        if not rows:
+            return
+        self._pending[kind] = []
+        if kind == "focus_session":
+            self._insert_sessions(conn, rows)
+        elif kind == "goal":
+            self._insert_goals(conn, rows)
+        else:
+            self._insert_memberships(conn, rows)
+
+    def _existing_users(self, conn, rows: list[dict]) -> set[int]:
+        return set(conn.scalars(select(User.id).where(User.id.in_({row["user_id"] for row in rows}))))
+
+    def _new_rows(self, conn, kind: str, rows: list[dict]) -> list[dict]:
+        """Rows whose natural key did not exist before this import began."""
+        if not rows:
+            return rows
+        table = KINDS[kind]
+        if kind not in self._id_floor:
+            self._id_floor[kind] = conn.scalar(select(func.coalesce(func.max(table.c.id), 0)))
+        names = _NATURAL_KEYS[kind]
+        indexed = table.c[names[1]]
+        values = {row[names[1]] for row in rows}
+        match = indexed.in_(values - {None})
+        if None in values:
+            match = or_(match, indexed.is_(None))
+        existing = {
+            tuple(found) for found in conn.execute(
+                select(*(table.c[name] for name in names)).where(
+                    table.c.user_id.in_({row["user_id"] for row in rows}),
+                    match,
+                    table.c.id <= self._id_floor[kind],     # rows this import added are not duplicates
+                )
+            )
+        }
+        return [row for row in rows if tuple(row[name] for name in names) not in existing]
+
+    def _insert_sessions(self, conn, rows: list[dict]):
+        users = self._existing_users(conn, rows)
+        kept = self._new_rows(conn, "focus_session", [row for row in rows if row["user_id"] in users])
+        if kept:
+            conn.execute(insert(FocusSession), kept)
+        self.imported["focus_session"] += len(kept)
+        self.skipped["focus_session"] += len(rows) - len(kept)
+        self._users.update(row["user_id"] for row in kept)
+        days = [row["started_at"].date() for row in kept if row.get("started_at") is not None]
+        if days:
+            low, high = min(days), max(days)
+            self._day_from = low if self._day_from is None else min(self._day_from, low)
+            self._day_to = high if self._day_to is None else max(self._day_to, high)
+
+    def _insert_goals(self, conn, rows: list[dict]):
+        users = self._existing_users(conn, rows)
+        kept = self._new_rows(conn, "goal", [row for row in rows if row["user_id"] in users])
+        if kept:
+            conn.execute(insert(Goal), kept)
+        self.imported["goal"] += len(kept)
+        self.skipped["goal"] += len(rows) - len(kept)
+
+    def _insert_memberships(self, conn, rows: list[dict]):
+        ids = {row.get("challenge_id") for row in rows}
+        challenges = set(conn.scalars(select(Challenge.id).where(Challenge.id.in_(ids))))
+        users = self._existing_users(conn, rows)
+        kept = [row for row in rows if row.get("challenge_id") in challenges and row["user_id"] in users]
+        added = []
+        if kept:
+            stmt = dialect_insert(conn.dialect.name)(ChallengeParticipant).on_conflict_do_nothing()
+            added = conn.execute(
+                stmt.returning(ChallengeParticipant.challenge_id, ChallengeParticipant.user_id), kept
+            ).all()
+        self._challenges.update(challenge_id for challenge_id, _ in added)
+        self._users.update(user_id for _, user_id in added)
+        self.imported["challenge_membership"] += len(added)
+        self.skipped["challenge_membership"] += len(rows) - len(added)
+
+
+def _recount_challenges(conn, challenge_ids: set[int]):
+    """participant_count, progress_sum and group_progress from challenge_participants."""
+    members = select(func.count()).where(
+        ChallengeParticipant.challenge_id == Challenge.id
+    ).scalar_subquery()
+    progress = select(func.coalesce(func.sum(ChallengeParticipant.progress), 0.0)).where(
+        ChallengeParticipant.challenge_id == Challenge.id
+    ).scalar_subquery()
+    ids = sorted(challenge_ids)
+    for start in range(0, len(ids), IMPORT_BATCH):
+        conn.execute(
+            update(Challenge)
+            .where(Challenge.id.in_(ids[start:start + IMPORT_BATCH]))
+            .values(participant_count=members, progress_sum=progress, group_progress=_group_average(members, progress))
+        )
+
+
+def import_lines(engine, lines: Iterable[bytes | str], user_id: int | None = None) -> dict:
+    """Import NDJSON `lines` in one transaction; raises InvalidRecord on a bad line.
+
+    Pass database.write_engine: the import reads before it writes.
+    """
+    importer = Importer(user_id=user_id)
+    with engine.begin() as conn:
+        importer.feed(conn, lines)
+        return importer.finish(conn)
+
+
+# ============================================================
+# CLI
+# ============================================================
+def main():
+    from .database import engine, write_engine
+    from .migrations import upgrade
+
+    parser = argparse.ArgumentParser(description="Export or import a user's data as NDJSON")
+    sub = parser.add_subparsers(dest="command", required=True)
+    export = sub.add_parser("export", help="write a user's sessions, goals and memberships")
+    export.add_argument("user_id", type=int)
+    export.add_argument("-o", "--output", help="file to write (default: stdout)")
+    export.add_argument("--kinds", default=",".join(KINDS), help="comma-separated record types")
+    load = sub.add_parser("import", help="load an export in one transaction")
+    load.add_argument("file", help="NDJSON file, or - for stdin")
+    load.add_argument("--user-id", type=int, help="assign every row to this user")
+    args = parser.parse_args()
+
+    upgrade(engine)
+    if args.command == "export":
+        kinds = [kind.strip() for kind in args.kinds.split(",") if kind.strip()]
+        unknown = [kind for kind in kinds if kind not in KINDS]
+        if unknown:
+            parser.error(f"unknown kinds: {', '.join(unknown)}")
+        out = open(args.output, "wb") if args.output else sys.stdout.buffer
+        try:
+            for chunk in stream_export(engine, args.user_id, kinds):
+                out.write(chunk)
+        finally:
+            if args.output:
+                out.close()
+        return
+
+    source = sys.stdin.buffer if args.file == "-" else open(args.file, "rb")
+    try:
+        summary = import_lines(write_engine, source, args.user_id)
+    except InvalidRecord as exc:
+        sys.exit(f"Import failed, nothing written: {exc}")
+    finally:
+        if args.file != "-":
+            source.close()
+    print(json.dumps(summary))
+
+
+if __name__ == "__main__":
+    main()